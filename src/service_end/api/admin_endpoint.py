@@ -1,13 +1,37 @@
-from ..exception import ServiceEndExceptionBase
-from ..data import db, insert_operator, get_operator, update_operator, delete_operator
-from ..data.model import JobModel, CVModel, LLMCard, InterviewerModel, DomainQuestionBank
-from ..service import question_gen_workflow
+from ..exception import UploadError
+from ..data import db, insert_operator, get_operator, update_operator, delete_operator, global_cache
+from ..data.model import (
+    JobModel, CVModel, LLMCard, InterviewerModel, DomainQuestionBank, QuestionModel, ImportChunkProgress, UpsertResult,
+    Page, TaskModel,
+)
+from ..data.utils import OnConflict
+from ..service import task_queue, QUESTION_GEN_TASK, CV_PARSE_TASK
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, File, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Iterator, AsyncIterator
+import io
+import csv
+import json
 
 router = APIRouter(prefix="/admin", tags=["Admin Endpoints"])
 SessionDepends_Commit = Depends(db.get_session_commit, use_cache=False)  # with commit
 SessionDepends_WT_Commit = Depends(db.get_session_wt_commit, use_cache=False)  # without commit
+PageLimit = Query(100, ge=1, le=1000)  # 分页接口的单页条数
+
+
+async def _ndjson(items: AsyncIterator[BaseModel | str]) -> AsyncIterator[str]:
+    """将逐行迭代的结果编码为 NDJSON"""
+    async for item in items:
+        if isinstance(item, BaseModel):
+            yield item.model_dump_json() + "\n"
+        else:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def _ndjson_response(items: AsyncIterator[BaseModel | str]) -> StreamingResponse:
+    return StreamingResponse(_ndjson(items), media_type="application/x-ndjson")
 
 
 # get data
@@ -17,6 +41,18 @@ def status(session: AsyncSession = SessionDepends_WT_Commit):
     return {"message": f"interview simulator is alive. dependency '{session.__class__.__name__}' is injected"}
 
 
+@router.get("/cache_stats")
+async def cache_stats() -> dict:
+    """缓存统计：按 KeyType 的命中、未命中、过期、容量淘汰、加载耗时直方图、当前条数"""
+    return global_cache.stats_snapshot()
+
+
+@router.get("/pool_stats")
+async def pool_stats() -> dict:
+    """连接池统计：主库与各只读副本的连接数、等待数、获取连接耗时直方图"""
+    return db.pool_stats()
+
+
 @router.get("/all_domain_name")
 async def get_all_domain_name(session: AsyncSession = SessionDepends_WT_Commit) -> list[str]:
     """当前数据库内已有领域题库的领域名称"""
@@ -53,6 +89,70 @@ async def get_all_interviewer(session: AsyncSession = SessionDepends_WT_Commit):
     return await get_operator.all_interviewer(session=session)
 
 
+@router.get("/all_job/page", response_model=Page[JobModel])
+async def get_job_page(
+    after: str | None = None,
+    limit: int = PageLimit,
+    session: AsyncSession = SessionDepends_WT_Commit
+):
+    """按名称游标分页查询 Job。`after` 为上一页返回的 `next_cursor`"""
+    return await get_operator.job_page(session=session, after=after, limit=limit)
+
+
+@router.get("/all_cv_title/page", response_model=Page[str])
+async def get_cv_title_page(
+    after: str | None = None,
+    limit: int = PageLimit,
+    session: AsyncSession = SessionDepends_WT_Commit
+):
+    """按名称游标分页查询 cv 名称"""
+    return await get_operator.cv_title_page(session=session, after=after, limit=limit)
+
+
+@router.get("/all_llm/page", response_model=Page[LLMCard])
+async def get_llm_page(
+    after: str | None = None,
+    limit: int = PageLimit,
+    session: AsyncSession = SessionDepends_WT_Commit
+):
+    """按模型名称游标分页查询 LLM"""
+    return await get_operator.llm_page(session=session, after=after, limit=limit)
+
+
+@router.get("/all_interviewer/page", response_model=Page[InterviewerModel])
+async def get_interviewer_page(
+    after: str | None = None,
+    limit: int = PageLimit,
+    session: AsyncSession = SessionDepends_WT_Commit
+):
+    """按名称游标分页查询 Interviewer"""
+    return await get_operator.interviewer_page(session=session, after=after, limit=limit)
+
+
+@router.get("/all_job/stream")
+async def stream_all_job(session: AsyncSession = SessionDepends_WT_Commit) -> StreamingResponse:
+    """以 NDJSON 流式返回全部 Job，每行一个 JobModel"""
+    return _ndjson_response(get_operator.stream_job(session=session))
+
+
+@router.get("/all_cv_title/stream")
+async def stream_all_cv_title(session: AsyncSession = SessionDepends_WT_Commit) -> StreamingResponse:
+    """以 NDJSON 流式返回全部 cv 名称，每行一个 JSON 字符串"""
+    return _ndjson_response(get_operator.stream_cv_title(session=session))
+
+
+@router.get("/all_llm/stream")
+async def stream_all_llm(session: AsyncSession = SessionDepends_WT_Commit) -> StreamingResponse:
+    """以 NDJSON 流式返回全部 LLM，每行一个 LLMCard"""
+    return _ndjson_response(get_operator.stream_llm(session=session))
+
+
+@router.get("/all_interviewer/stream")
+async def stream_all_interviewer(session: AsyncSession = SessionDepends_WT_Commit) -> StreamingResponse:
+    """以 NDJSON 流式返回全部 Interviewer，每行一个 InterviewerModel"""
+    return _ndjson_response(get_operator.stream_interviewer(session=session))
+
+
 # insert new data
 
 @router.put("/domain")
@@ -66,33 +166,86 @@ async def create_domain(
     await insert_operator.domain(session=session, model=model)
 
 
-@router.post("/domain/{domain_name}")
+@router.post("/domain/{domain_name}", status_code=202)
 async def create_question_batch(
     domain_name: str,
     sub_domain_names: list[str],
     number: int,
+) -> TaskModel:
+    """
+    提交后台任务：调用 LLM 工作流，批量插入 Question。
+    `domain_name`,`sub_domain_name` 代表 Question 所属领域。
+    各子领域并发生成，全部成功后在一个事务内写入；通过 `/admin/task/{task_id}` 查询任务状态
+    """
+    return await task_queue.submit(
+        kind=QUESTION_GEN_TASK,
+        params={"domain_name": domain_name, "number": number},
+        steps=sub_domain_names,
+    )
+
+
+@router.post("/cv/parse", status_code=202)
+async def parse_cv_batch(cv_files: list[UploadFile] = File(...)) -> TaskModel:
+    """
+    提交后台任务：批量解析 CV (.md)，文件名 (去掉 .md) 作为 CV 名称，同名 CV 覆盖。
+    通过 `/admin/task/{task_id}` 查询每份 CV 的进度
+    """
+    cvs: dict[str, str] = {}
+    for cv_file in cv_files:
+        file_name = str(cv_file.filename)
+        if not file_name.endswith(".md"):
+            raise UploadError(message="file name or type incorrect", file_name=file_name)
+        try:
+            cvs[file_name.removesuffix(".md")] = (await cv_file.read()).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise UploadError(message="unicode decode error", file_name=file_name) from e
+    return await task_queue.submit(kind=CV_PARSE_TASK, params={"cvs": cvs}, steps=list(cvs))
+
+
+@router.get("/task/{task_id}")
+async def get_task(task_id: int, session: AsyncSession = Depends(db.get_primary_session, use_cache=False)) -> TaskModel:
+    """查询后台任务状态与各步骤进度"""
+    return await get_operator.task(session=session, task_id=task_id)
+
+
+def _iter_question_rows(file: UploadFile) -> Iterator[tuple[str, str, QuestionModel]]:
+    """
+    逐行解析题目文件 (.ndjson/.jsonl 或带表头的 .csv)。
+    每行字段: domain_name, sub_domain_name, question, answer, criterion_low, criterion_mid, criterion_high
+    """
+    file_name = str(file.filename)
+    text = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    if file_name.endswith(".csv"):
+        records = csv.DictReader(text)
+    elif file_name.endswith((".ndjson", ".jsonl")):
+        records = (json.loads(line) for line in text if line.strip())
+    else:
+        raise UploadError(message="file type must be .ndjson, .jsonl or .csv", file_name=file_name)
+
+    count = 0  # 已解析的记录数
+    try:
+        for record in records:
+            yield record["domain_name"], record["sub_domain_name"], QuestionModel.model_validate(record)
+            count += 1
+    except (ValueError, KeyError, TypeError, ValidationError) as e:  # 含 UnicodeDecodeError, JSONDecodeError
+        raise UploadError(message=f"invalid record #{count + 1}: {e!r}", file_name=file_name) from e
+
+
+@router.post("/question/import", response_model=list[ImportChunkProgress])
+async def import_questions(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(default=5000, ge=1, le=100000),
     session: AsyncSession = SessionDepends_Commit
 ):
     """
-    调用 LLM 工作流，批量插入 Question。
-    `domain_name`,`sub_domain_name` 代表 Question 所属领域
+    流式批量导入 Question，按 `chunk_size` 分批 COPY 写入，返回每批进度。
+    任一行解析失败或 domain 不存在时整体回滚
     """
-    try:
-        for sub_domain_name in sub_domain_names:
-            questions = await question_gen_workflow(
-                domain_name=domain_name,
-                sub_domain_name=sub_domain_name,
-                number=number
-            )
-            await insert_operator.question_batch(
-                session=session,
-                domain_name=domain_name,
-                sub_domain_name=sub_domain_name,
-                models=questions,
-            )
-    except ServiceEndExceptionBase as e:
-        await delete_operator.domain_question_bank(session=session, domain_name=domain_name)
-        raise e
+    return await insert_operator.question_stream(
+        session=session,
+        rows=_iter_question_rows(file),
+        chunk_size=chunk_size,
+    )
 
 
 @router.put("/job/{name}")
@@ -100,26 +253,29 @@ async def insert_job(
     name: str,
     job_requirements: list[str],
     job_responsibilities: list[str],
+    on_conflict: OnConflict = Query(default=OnConflict.ERROR),
     session: AsyncSession = SessionDepends_Commit
-):
+) -> UpsertResult:
     """创建 job"""
-    await insert_operator.job(
+    return await insert_operator.job(
         session = session,
         model = JobModel(
             name=name,
             job_requirements=job_requirements,
             job_responsibilities=job_responsibilities
-        )
+        ),
+        on_conflict=on_conflict,
     )
 
 
 @router.put("/cv/{title}")
 async def insert_cv_batch(
     cv: list[CVModel],
+    on_conflict: OnConflict = Query(default=OnConflict.ERROR),
     session: AsyncSession = SessionDepends_Commit
-):
-    """批量插入 cv"""
-    await insert_operator.cv_batch(session=session, models=cv)
+) -> UpsertResult:
+    """批量插入 cv。`on_conflict`: error 整批失败, skip 跳过已存在的 title, update 覆盖已存在的 title"""
+    return await insert_operator.cv_batch(session=session, models=cv, on_conflict=on_conflict)
 
 
 @router.put("/llm/{model}")
@@ -129,10 +285,11 @@ async def insert_llm(
     path: str,
     cost: float = Query(default=0.),
     cost_limit: float = Query(default=1E8),
+    on_conflict: OnConflict = Query(default=OnConflict.ERROR),
     session: AsyncSession = SessionDepends_Commit
-):
+) -> UpsertResult:
     """创建 LLM"""
-    await insert_operator.llm(
+    return await insert_operator.llm(
         session = session,
         llm_card = LLMCard(
             model=model,
@@ -140,7 +297,8 @@ async def insert_llm(
             path=path,
             cost=cost,
             cost_limit=cost_limit
-        )
+        ),
+        on_conflict=on_conflict,
     )
 
 
@@ -1,9 +1,9 @@
 # endpoints for user client
 from ..data import db, insert_operator, get_operator, delete_operator
-from ..data.model import CVModel
+from ..data.model import CVModel, QuestionModel
 from ..exception import UploadError
 from ..service import parse_cv_workflow
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, UploadFile, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/user", tags=["User Endpoints"])
@@ -49,6 +49,21 @@ async def delete_cv(title: str, session: AsyncSession = SessionDepends_Commit):
 
 # interview
 
+@router.get("/question/sample", response_model=list[QuestionModel])
+async def sample_questions(
+    domain_name: str,
+    sub_domain_name: str,
+    k: int = Query(default=1, ge=1, le=100),
+    session: AsyncSession = SessionDepends_WT_Commit
+):
+    """从一个子领域不放回地随机抽取 k 道题"""
+    return await get_operator.sample_questions(
+        session=session,
+        domain_name=domain_name,
+        sub_domain_name=sub_domain_name,
+        k=k
+    )
+
 
 
 
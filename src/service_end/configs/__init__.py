@@ -21,6 +21,7 @@ try:
     FASTAPI_KWARGS = __config["run"]["fastapi"]
     CACHE_CONFIG = __config["cache"]
     DATA_CONFIG = __config["data"]
+    SERVICE_CONFIG = __config["service"]
     
     assert (
         isinstance(INTERVAL, int) and 
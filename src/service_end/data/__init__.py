@@ -1,12 +1,26 @@
-from .orm import Base, Base2, Variable
-from .operation import insert_operator, get_operator, update_operator, delete_operator
-from .utils import VariableInitialDict, insert_execute
+from .orm import Base, Base2, Variable, Domain, DOMAIN_ID_SEQ
+from .operation import insert_operator, get_operator, update_operator, delete_operator, global_cache
+from .utils import (
+    VariableInitialDict, VariableEnum, insert_execute, pop_dirty_tables, pop_cache_patches, pop_cache_replaces
+)
+from .invalidation import InvalidationBus
+from .warmup import cache_warmup
+from .snapshot import save_snapshot, load_snapshot
+from .migration import migrate, MIGRATION_LOCK
+from .replica import ReplicaRouter
+from .pool import PoolMetrics, engine_options, pool_snapshot
 from ..exception import ServiceInitException, DatabaseException
-from sqlalchemy import inspect, text, insert
+from sqlalchemy import inspect, text, insert, select
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.exc import SQLAlchemyError
+from fastapi import Request, Response
+from typing import Any, AsyncIterator
+from contextlib import asynccontextmanager
+import logging
 
 SERVER_DRIVER = "asyncpg"
+READ_YOUR_WRITES_COOKIE = "simu_read_primary"  # 写请求后设置, 存在期间该客户端的读请求走主库
+logger = logging.getLogger(__name__)
 
 
 try:
@@ -17,58 +31,145 @@ try:
     target_schema=DATA_CONFIG["target_schema"]
     clear_exists=DATA_CONFIG["clear_exists"]
     engine_url = ensemble_engine_url(**DATA_CONFIG["url"])
+    pool_config = DATA_CONFIG["pool"]
+    replica_urls = [ensemble_engine_url(**url) for url in DATA_CONFIG.get("replicas") or []]
+    replica_health_interval = DATA_CONFIG.get("replica_health_interval", 5)
+    replica_max_lag = DATA_CONFIG.get("replica_max_lag", 10)
+
+    from ..configs import CACHE_CONFIG
+    invalidation_bus = (
+        InvalidationBus(cache=global_cache, channel=CACHE_CONFIG["invalidation_channel"])
+        if CACHE_CONFIG["invalidation_bus"] else None
+    )
+    warmup_config = CACHE_CONFIG["warmup"]
+    snapshot_config = CACHE_CONFIG["snapshot"]
 except KeyError as e:
     raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
 
 
 class DataBaseManager:
-    """全局数据库访问控制"""
+    """
+    全局数据库访问控制。写 session 使用主库；配置了只读副本时，读 session 轮询分配到健康副本，
+    副本不可用或客户端刚发起过写请求 (带有 READ_YOUR_WRITES_COOKIE) 时使用主库
+    """
 
     def __init__(self):
         self.engine: None | AsyncEngine = None
         self.session_maker: None | async_sessionmaker[AsyncSession] = None
+        self.replicas: None | ReplicaRouter = None
+        self.pool_metrics: None | PoolMetrics = None
 
-    def initiate(self, engine: AsyncEngine):
+    def initiate(self, engine: AsyncEngine, pool_metrics: PoolMetrics, replicas: ReplicaRouter | None = None):
         self.engine = engine
+        self.pool_metrics = pool_metrics
         self.session_maker = async_sessionmaker(
             bind=engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        self.replicas = replicas
+
+    def pool_stats(self) -> dict[str, Any]:
+        """主库与各副本连接池的当前状态与累计指标"""
+        assert self.engine and self.pool_metrics
+        return {
+            "primary": pool_snapshot(self.engine, self.pool_metrics),
+            "replicas": self.replicas.pool_stats() if self.replicas is not None else [],
+        }
+
+    async def start(self) -> None:
+        if self.replicas is not None:
+            await self.replicas.start()
 
     async def close(self) -> None:
         assert self.engine
+        if self.replicas is not None:
+            await self.replicas.stop()
         await self.engine.dispose()
 
-    async def get_session_commit(self):
+    async def __read_session(self, request: Request) -> AsyncSession:
+        """选择读 session：健康副本优先，获取副本连接失败时摘除该副本并重选"""
+        assert self.session_maker
+        if self.replicas is None or READ_YOUR_WRITES_COOKIE in request.cookies:
+            return self.session_maker()
+        while (index := self.replicas.pick()) is not None:
+            session = self.replicas.session_makers[index]()
+            try:
+                await session.connection()
+                return session
+            except (OSError, SQLAlchemyError):
+                await session.close()
+                self.replicas.mark_down(index)
+        return self.session_maker()
+
+    async def get_session_commit(self, response: Response):
         """with commit 的 session"""
         # 使用生成器函数，便于 fastapi 依赖注入和管理 session 生命周期
         # 注入 API 后，在 API 内使用 session 无需使用 with 或手动实现生命周期管理
+        if self.replicas is not None:  # 副本追上之前，该客户端的读请求走主库
+            response.set_cookie(READ_YOUR_WRITES_COOKIE, "1", max_age=int(replica_max_lag), httponly=True)
+        async with self.transaction() as session:
+            yield session
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncSession]:
+        """
+        with commit 的 session，用于请求之外 (如后台任务) 的写入。
+        退出时提交，异常时回滚；提交后广播并失效被写入表的缓存
+        """
         assert self.session_maker
         async with self.session_maker() as session:
             try:
                 yield session       # 开始事务
             except Exception as e:  # 事务执行期间抛出异常
                 await session.rollback()
+                pop_dirty_tables(session)
+                pop_cache_patches(session)
+                pop_cache_replaces(session)
                 raise e
+            # 只处理有缓存依赖的表，task 等表的写入不广播
+            tables = global_cache.tracked(pop_dirty_tables(session))
+            patches = pop_cache_patches(session)
+            replaces = pop_cache_replaces(session)
             try:
+                # 广播被写入的表与列表缓存的元素替换，其它 worker 在提交后收到通知
+                if invalidation_bus is not None and tables:
+                    await invalidation_bus.notify(session, tables, replaces)
                 await session.commit()  # 提交事务
             except Exception as e:      # 事务提交期间抛出异常
                 await session.rollback()
                 raise DatabaseException(f"error while session commit: {str(e)}")
+            # 提交成功后使依赖被写入表的缓存失效，登记了写穿更新的缓存替换为新值
+            global_cache.invalidate_tables(tables, patches=patches)
 
-    async def get_session_wt_commit(self):
+    async def get_primary_session(self):
+        """without commit 的主库 session，用于需要读到最新写入的查询"""
+        assert self.session_maker
+        async with self.session_maker() as session:
+            yield session
+
+    async def get_session_wt_commit(self, request: Request):
         """without commit 的 session"""
         # 使用生成器函数，便于 fastapi 依赖注入和管理 session 生命周期
         # 注入 API 后，在 API 内使用 session 无需使用 with 或手动实现生命周期管理
-        assert self.session_maker
-        async with self.session_maker() as session:
+        async with await self.__read_session(request) as session:
             yield session  # 开始事务
 
 
 # 全局唯一实例
 db = DataBaseManager()
-db.initiate(engine=create_async_engine(url=engine_url))
+primary_pool_metrics = PoolMetrics()
+db.initiate(
+    engine=create_async_engine(url=engine_url, **engine_options(pool_config, primary_pool_metrics)),
+    pool_metrics=primary_pool_metrics,
+    replicas=(
+        ReplicaRouter(replica_urls, health_interval=replica_health_interval, pool_config=pool_config)
+        if replica_urls else None
+    ),
+)
+global_cache.session_factory = db.session_maker  # stale-while-revalidate 后台刷新
+global_cache.replica_lag = replica_max_lag if replica_urls else 0.
+__schema_migrated = False  # 本次启动是否执行了 schema 迁移
 
 async def __init_variable_table(session: AsyncSession) -> None:
     """insert data into Variable"""
@@ -102,6 +203,66 @@ async def __execute_not_clear(session: AsyncSession) -> None:
     if not inspector.has_table(table_name="variable"):
         await conn.run_sync(Base2.metadata.create_all)
         await __init_variable_table(session=session)
+    await __sync_domain_id_seq(session=session)
+
+
+async def __sync_domain_id_seq(session: AsyncSession) -> None:
+    """
+    将 domain_id_seq 推进到已分配 id 之后。
+    旧版本由 variable 表的 DOMAIN_COUNT 计数分配 domain_id，升级后序列从 1 开始，需跳过已有 id。重复执行无副作用。
+    多个进程同时启动时以迁移的 advisory lock 串行化 (事务级, 提交时释放)；
+    序列当前值在 setval 的同一条语句内读取，已运行的进程在此期间分配的 id 不会被回退
+    """
+    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK})
+    domain_count = await session.scalar(
+        select(Variable.value).where(Variable.name == VariableEnum.DOMAIN_COUNT.value)
+    )
+    domain_count = domain_count["value"] if domain_count is not None else 0
+    await session.execute(
+        text(
+            f"SELECT setval('{DOMAIN_ID_SEQ.name}', GREATEST(allocated, 1), allocated > 0) FROM ("
+            f" SELECT GREATEST("
+            f"  (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {DOMAIN_ID_SEQ.name}),"
+            f"  (SELECT coalesce(max(domain_id), 0) FROM {Domain.__tablename__}),"
+            f"  CAST(:domain_count AS bigint)"
+            f" ) AS allocated"
+            f") AS sync"
+        ),
+        {"domain_count": domain_count},
+    )
+
+
+async def warmup() -> None:
+    """按 cache.warmup 配置预热缓存"""
+    assert db.session_maker
+    if warmup_config["enabled"]:
+        await cache_warmup(
+            session_maker=db.session_maker,
+            top_domains=warmup_config["top_domains"],
+            timeout=warmup_config["timeout"],
+        )
+
+
+def load_cache_snapshot() -> None:
+    """按 cache.snapshot 配置加载缓存快照。clear_exists 或本次启动执行了迁移时，快照不再有效"""
+    if not snapshot_config["enabled"] or clear_exists or __schema_migrated:
+        return
+    try:
+        count = load_snapshot(global_cache, path=snapshot_config["path"], max_age=snapshot_config["max_age"])
+        logger.info(f"cache snapshot loaded: {count} entries")
+    except Exception:
+        logger.warning("cache snapshot load failed", exc_info=True)
+
+
+def save_cache_snapshot() -> None:
+    """按 cache.snapshot 配置写入缓存快照"""
+    if not snapshot_config["enabled"]:
+        return
+    try:
+        count = save_snapshot(global_cache, path=snapshot_config["path"])
+        logger.info(f"cache snapshot saved: {count} entries")
+    except Exception:
+        logger.warning("cache snapshot save failed", exc_info=True)
 
 
 async def table_init():
@@ -147,8 +308,20 @@ async def table_init():
             await session.rollback()
             raise DatabaseException(f"error while session commit: {str(e)}")
 
+    # 已有表的结构演进
+    global __schema_migrated
+    try:
+        applied = await migrate(engine)
+    except SQLAlchemyError as e:
+        raise ServiceInitException(source_class=e.__class__.__name__, message=f"schema migration failed: {e}") from e
+    if applied:
+        logger.info(f"{applied} schema migrations applied")
+    __schema_migrated = applied > 0
+
 
 __all__ = [
-    "table_init", "engine_url", "db",  # 服务端启动
+    "table_init", "warmup", "engine_url", "db", "invalidation_bus",  # 服务端启动
+    "load_cache_snapshot", "save_cache_snapshot",
     "insert_operator", "get_operator", "update_operator", "delete_operator",  # APIRouter 调用
+    "global_cache",  # 缓存统计
 ]
\ No newline at end of file
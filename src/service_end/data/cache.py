@@ -1,10 +1,23 @@
-from ..exception import DBCacheError
+from ..exception import DBCacheError, TargetedRecordNotFound
+from ..metrics import Histogram
+import sys
+import logging
 import time
+import asyncio
+import heapq
 import inspect
-from collections import OrderedDict
-from typing import Any, Callable
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
 from enum import Enum
-from functools import wraps
+from functools import wraps, partial
+from contextlib import AbstractAsyncContextManager
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+REPLICA_SESSION = "replica"  # session.info 中标记只读副本 session 的键
+DIRTY_TABLES = "dirty_tables"  # session.info 中记录本事务写入表名的键
 
 
 class KeyType(Enum):
@@ -13,6 +26,7 @@ class KeyType(Enum):
     DOMAIN_SUBDOMAIN = "DOMAIN_SUBDOMAIN"
     CV_TITLE = "CV_TITLE"
     QUESTION_BANK = "QUESTION_BANK"
+    QUESTION_IDS = "QUESTION_IDS"
     ALL_DOMAIN_NAME = "ALL_DOMAIN_NAME"
     ALL_JOB = "ALL_JOB"
     ALL_CV_TITLE = "ALL_CV_TITLE"
@@ -28,6 +42,7 @@ class KeyFactory:
     1. 在 `KeyTpye` 加上键类型
     2. 在 `KeyFactory` 下方添加对应的 _get 方法
     3. 在 router 中注册 _get 方法
+    4. 在 `with_cache_async` 的 `tables` 中声明缓存数据读取的表
     """
 
     @classmethod
@@ -50,6 +65,8 @@ class KeyFactory:
             return cls.__get_cv_title
         elif key_type == KeyType.QUESTION_BANK:
             return cls.__get_question_bank
+        elif key_type == KeyType.QUESTION_IDS:
+            return cls.__get_question_ids
         elif key_type == KeyType.ALL_DOMAIN_NAME:
             return cls.__get_all_domain_name
         elif key_type == KeyType.ALL_JOB:
@@ -75,6 +92,10 @@ class KeyFactory:
     def __get_question_bank(cls, domain_name: str) -> str:
         return f"QUESTION_BANK_{domain_name}"
 
+    @classmethod
+    def __get_question_ids(cls, domain_name: str, sub_domain_name: str) -> str:
+        return f"QUESTION_IDS_{domain_name}-{sub_domain_name}"
+
     @classmethod
     def __get_all_domain_name(cls) -> str:
         return "ALL_DOMAIN_NAME"
@@ -96,9 +117,115 @@ class KeyFactory:
         return "ALL_INTERVIEWER"
 
 
+def estimate_size(obj: Any) -> int:
+    """
+    估算对象占用的字节数：递归累加容器元素、对象 `__dict__` (含 Pydantic 模型字段) 的 `sys.getsizeof`。
+    被多处引用的对象只计一次
+    """
+    seen: set[int] = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif hasattr(o, "__dict__"):
+            stack.append(o.__dict__)
+    return total
+
+
+def replace_items(replacements: list[tuple[str, dict[str, Any]]], items: list[Any]) -> list[Any]:
+    """
+    写穿更新列表缓存：依次用 `replacements` 中的 (attr, JSON 数据) 替换 attr 值相同的元素。
+    新元素按被替换元素的类型校验，JSON 数据可随失效通知广播给其它 worker
+    """
+    for attr, data in replacements:
+        items = [type(item).model_validate(data) if getattr(item, attr) == data[attr] else item for item in items]
+    return items
+
+
+@dataclass(slots=True)
+class NegativeResult:
+    """负缓存：记录查询未找到目标记录时异常的参数，命中时构造新的异常抛出 (异常实例不在并发请求间共享)"""
+    table: str
+    filter_condition: str
+
+    def error(self) -> TargetedRecordNotFound:
+        return TargetedRecordNotFound(table=self.table, not_found_filter_condition=self.filter_condition)
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """一条缓存"""
+    created: float                   # 创建时间戳
+    expires: float                   # 过期时间戳
+    value: Any                       # 数据对象
+    tables: tuple[str, ...] = ()     # 数据来源表名, 任一表被写入时失效
+    key_type: KeyType | None = None  # 键类型, 用于统计
+    nbytes: int = 0                  # 估算字节数, 仅在设置字节预算时计算
+
+
+@dataclass(slots=True)
+class KeyTypeStats:
+    """一种 KeyType 的缓存统计"""
+    hits: int = 0         # 命中
+    misses: int = 0       # 未命中
+    expirations: int = 0  # TTL 过期移除
+    evictions: int = 0    # 容量淘汰
+    refreshes: int = 0    # 超过 soft_ttl 后触发的后台刷新
+    negative_hits: int = 0  # 命中负缓存 (含在 hits 内)
+    bypasses: int = 0     # 超过单条字节上限而未写入
+    entries: int = 0      # 当前条数
+    nbytes: int = 0       # 当前估算字节数
+    load_latency: Histogram = field(default_factory=Histogram)  # 未命中时被装饰函数的加载耗时, 单位 sec
+
+    def snapshot(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "negative_hits": self.negative_hits,
+            "bypasses": self.bypasses,
+            "entries": self.entries,
+            "bytes": self.nbytes,
+            "load_latency": self.load_latency.snapshot(),
+        }
+
+
+class CacheStats:
+    """按 KeyType 汇总的缓存统计。未声明 KeyType 的缓存记入 `OTHER`"""
+
+    def __init__(self):
+        self.__stats: dict[str, KeyTypeStats] = defaultdict(KeyTypeStats)
+
+    def of(self, key_type: KeyType | None) -> KeyTypeStats:
+        return self.__stats[key_type.value if key_type is not None else "OTHER"]
+
+    def reset_entries(self) -> None:
+        for stats in self.__stats.values():
+            stats.entries = 0
+            stats.nbytes = 0
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: stats.snapshot() for name, stats in sorted(self.__stats.items())}
+
+
 class DBCache:
     """
-    数据库查询缓存 (FIFO, 键值对数据)
+    数据库查询缓存 (LRU + TTL, 键值对数据)
     
     缓存对象
     ```
@@ -107,84 +234,375 @@ class DBCache:
     | {domain_name}-{sub_domain_name} | (domain_id, sub_domain_id) | Domain |
     | CV-{title} | CVModel 对象 | CV |
     | QUESTION_BANK_{domain_name} | DomainQuestionBank 对象 | Domain, Question |
+    | QUESTION_IDS_{domain_name}-{sub_domain_name} | 子领域全部 question id 的 array('q') | Domain, Question |
+    | ALL_DOMAIN_NAME | 所有 domain_name 的列表 | Domain |
     | ALL_JOB | JobModel 的列表 | Job |
     | ALL_CV_TITLE | 所有 CV 的 title 的列表 | CV |
     | ALL_LLM | 所有 LLMCard 的列表 | LLM |
     | ALL_INTERVIEWER | 所有 Interviewer 的列表 | Interviewer |
     ```
 
+    - 淘汰：`get` 命中时将 key 移到队尾，容量满时淘汰队首 (最久未使用) 的 key
+    - 过期：过期时间戳记录在最小堆内，每次读写只弹出已到期的堆顶。
+      key 被覆盖或删除后，堆内遗留的旧条目在弹出时通过创建时间戳识别并丢弃
+    - 失效：缓存写入时登记 "关联 table"，`invalidate_tables` 移除依赖被写入表的所有 key，
+      并递增这些表的版本号。加载前后版本号不一致时，加载结果不写入缓存
+    - 字节预算：设置 `max_bytes` 后，写入时估算每条缓存的字节数，按 LRU 淘汰直到总量不超过预算；
+      单条超过 `max_entry_bytes` 的数据不写入缓存
+    - 负缓存：值为 `NegativeResult` 的缓存表示记录不存在，使用单独的短 TTL
+    - 副本延迟：表被写入后 `replica_lag` 秒内，从只读副本 session 加载的结果可能是旧数据，不写入缓存
+
     Attributes:
         ttl (float): 缓存存活时间, 单位 sec
         size (int): 缓存条数
-        cache (OrderedDict): 缓存数据。key: 缓存索引, value: (创建时间戳, 数据对象)
+        max_bytes (int | None): 缓存总字节预算, `None` 时只按条数限制
+        max_entry_bytes (int | None): 单条缓存字节上限, 默认等于 `max_bytes`
+        nbytes (int): 当前估算总字节数
+        cache (OrderedDict): 缓存数据, 按最近使用排序。key: 缓存索引, value: CacheEntry
+        stats (CacheStats): 按 KeyType 的命中、过期、淘汰统计
+        tracked_tables (set[str]): `with_cache_async` 声明过的数据来源表, 其它表的写入无需失效或广播
     """
 
-    def __init__(self, size: int, ttl: float):
+    session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]] | None = None  # 后台刷新使用的 session 工厂
+    replica_lag: float = 0.  # 只读副本的最大复制延迟, 单位 sec
+
+    def __init__(
+            self,
+            size: int,
+            ttl: float,
+            max_bytes: int | None = None,
+            max_entry_bytes: int | None = None,
+    ):
         assert ttl > 0
         self.ttl = ttl
         self.size = max(size, 1)
-        self.cache: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes
+        self.nbytes = 0
+        self.cache: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.__expire_heap: list[tuple[float, float, str]] = []  # (过期时间戳, 创建时间戳, key)
+        self.__table_keys: dict[str, set[str]] = defaultdict(set)  # key: 表名, value: 依赖该表的缓存键
+        self.__table_version: dict[str, int] = defaultdict(int)    # key: 表名, value: 失效次数
+        self.__table_written: dict[str, float] = {}                 # key: 表名, value: 最近一次失效的时间戳
+        self.__epoch = 0  # 清空次数
+        self.stats = CacheStats()
+        self.tracked_tables: set[str] = set()
 
-    def __check_alive(self, create_timestamp: float) -> bool:
+    def __check_alive(self, entry: CacheEntry, now: float) -> bool:
         """缓存有效性检查"""
-        return time.time() - create_timestamp < self.ttl
-    
-    def __check_alive_and_remove(self):
-        """检查全部缓存数据有效性, 移除无效数据"""
-        keys = list(self.cache.keys())
-        for key in keys:
-            if not self.__check_alive(self.cache[key][0]):
-                self.cache.pop(key)
-    
+        return now < entry.expires
+
+    def __remove(self, key: str) -> CacheEntry | None:
+        """移除一个缓存并注销其关联 table"""
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.__unlink(key, entry)
+            stats = self.stats.of(entry.key_type)
+            stats.entries -= 1
+            stats.nbytes -= entry.nbytes
+            self.nbytes -= entry.nbytes
+        return entry
+
+    def __unlink(self, key: str, entry: CacheEntry) -> None:
+        for table in entry.tables:
+            keys = self.__table_keys.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.__table_keys[table]
+
+    def __remove_expired(self, now: float) -> None:
+        """弹出所有已到期的堆顶并移除对应缓存。均摊 O(log n)"""
+        heap = self.__expire_heap
+        while heap and heap[0][0] <= now:
+            _, create_timestamp, key = heapq.heappop(heap)
+            entry = self.cache.get(key)
+            if entry is not None and entry.created == create_timestamp:  # 堆条目仍对应当前缓存
+                self.__remove(key)
+                self.stats.of(entry.key_type).expirations += 1
+
+    def __compact_heap(self) -> None:
+        """覆盖、删除会在堆内留下失效条目，数量超过缓存条数时重建堆"""
+        if len(self.__expire_heap) > 2 * len(self.cache) + 64:
+            self.__expire_heap = [
+                (entry.expires, entry.created, key)
+                for key, entry in self.cache.items()
+            ]
+            heapq.heapify(self.__expire_heap)
+
     def get(self, key: str,) -> Any | None:
         """
         尝试获取一组缓存。key 不存在时返回 `None`
         """
-        value = self.cache.get(key)
-        if value is not None:
-            create_timestamp, data = value
-            if self.__check_alive(create_timestamp):
-                return data
-            else:
-                self.cache.pop(key)
-        return None  # 缓存对象本身就不存在，或被 pop 掉了
-
-    def update(self, key: str, value: Any, check_alive: bool = True) -> None:
-        """创建/更新一组缓存"""
-        if check_alive:
-            self.__check_alive_and_remove()
-        if len(self.cache) >= self.size:
-            self.cache.popitem(last=False)  # FIFO
-        self.cache[key] = (time.time(), value,)
-
-    def batch_update(self, data: dict) -> None:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    def get_entry(self, key: str) -> CacheEntry | None:
+        """同 `get`，返回包含创建时间戳的 CacheEntry"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None  # 缓存对象本身就不存在
+        if not self.__check_alive(entry, time.time()):
+            self.__remove(key)
+            self.stats.of(entry.key_type).expirations += 1
+            return None
+        self.cache.move_to_end(key)  # 刷新最近使用
+        return entry
+
+    def update(
+            self,
+            key: str,
+            value: Any,
+            tables: Iterable[str] = (),
+            key_type: KeyType | None = None,
+            ttl: float | None = None,
+            created: float | None = None,
+    ) -> None:
+        """
+        创建/更新一组缓存。`tables` 为数据来源表名, `ttl` 为这条缓存的存活时间, 默认 `self.ttl`。
+        `created` 用于恢复快照、写穿更新时保留原创建时间戳
+        """
+        now = time.time()
+        created = created if created is not None else now
+        expires = created + (ttl if ttl is not None else self.ttl)
+        self.__remove_expired(now)
+        self.__remove(key)
+        nbytes = 0
+        if self.max_bytes is not None:
+            nbytes = estimate_size(value)
+            if self.max_entry_bytes is not None and nbytes > self.max_entry_bytes:
+                self.stats.of(key_type).bypasses += 1
+                return
+        while self.cache and (
+            len(self.cache) >= self.size
+            or (self.max_bytes is not None and self.nbytes + nbytes > self.max_bytes)
+        ):
+            evicted = self.__remove(next(iter(self.cache)))  # LRU
+            assert evicted
+            self.stats.of(evicted.key_type).evictions += 1
+        entry = CacheEntry(
+            created=created,
+            expires=expires,
+            value=value,
+            tables=tuple(tables),
+            key_type=key_type,
+            nbytes=nbytes,
+        )
+        self.cache[key] = entry
+        stats = self.stats.of(key_type)
+        stats.entries += 1
+        stats.nbytes += nbytes
+        self.nbytes += nbytes
+        for table in entry.tables:
+            self.__table_keys[table].add(key)
+        heapq.heappush(self.__expire_heap, (expires, created, key))
+        self.__compact_heap()
+
+    def batch_update(self, data: dict, tables: Iterable[str] = (), key_type: KeyType | None = None) -> None:
         """创建/更新一批缓存"""
-        self.__check_alive_and_remove()
+        tables = tuple(tables)
         for k, v in data.items():
-            self.update(key=k, value=v, check_alive=False)
+            self.update(key=k, value=v, tables=tables, key_type=key_type)
 
     def pop(self, key: str) -> None:
         """删除一个缓存对象"""
-        if key in self.cache:
-            self.cache.pop(key)
+        self.__remove(key)
+
+    def clear(self) -> None:
+        """清空全部缓存，并使正在进行的加载结果不写入缓存"""
+        self.__epoch += 1
+        self.__table_keys.clear()
+        self.__expire_heap.clear()
+        self.cache.clear()
+        self.nbytes = 0
+        self.stats.reset_entries()
+
+    def stats_snapshot(self) -> dict:
+        """缓存配置与按 KeyType 的统计"""
+        return {
+            "size": self.size,
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+            "max_entry_bytes": self.max_entry_bytes,
+            "entries": len(self.cache),
+            "bytes": self.nbytes,
+            "key_types": self.stats.snapshot(),
+        }
+
+    def tracked(self, tables: Iterable[str]) -> set[str]:
+        """`tables` 中有缓存依赖的表"""
+        return self.tracked_tables.intersection(tables)
+
+    def table_version(self, tables: Iterable[str]) -> tuple[int, ...]:
+        """`tables` 当前的版本号。用于判断加载期间数据来源是否被写入"""
+        return (self.__epoch, *(self.__table_version.get(table, 0) for table in tables))
+
+    def written_within(self, tables: Iterable[str], seconds: float) -> bool:
+        """`tables` 中是否有表在最近 `seconds` 秒内被写入"""
+        since = time.time() - seconds
+        return any(self.__table_written.get(table, 0.) > since for table in tables)
+
+    def invalidate_tables(
+            self,
+            tables: Iterable[str],
+            patches: dict[str, Callable[[Any], Any]] | None = None,
+    ) -> None:
+        """
+        表被写入后调用：移除所有依赖这些表的缓存。
+        `patches` 中的 key 不移除，而是以 `patch(旧值)` 写穿更新，保留原创建时间与过期时间 (不延长存活时间, 不推迟 soft_ttl 刷新)
+        """
+        patches = patches or {}
+        keys: set[str] = set()
+        now = time.time()
+        for table in tables:
+            self.__table_version[table] += 1
+            self.__table_written[table] = now
+            keys.update(self.__table_keys.get(table, ()))
+        for key in keys:
+            entry = self.__remove(key)
+            patch = patches.get(key)
+            if entry is None or patch is None or isinstance(entry.value, NegativeResult) or entry.expires <= now:
+                continue
+            try:
+                value = patch(entry.value)
+            except Exception:
+                logger.warning(f"cache write-through failed, key dropped: {key}", exc_info=True)
+                continue
+            self.update(
+                key=key,
+                value=value,
+                tables=entry.tables,
+                key_type=entry.key_type,
+                ttl=entry.expires - entry.created,
+                created=entry.created,
+            )
+
 
+def _finish_load(inflight: dict[str, tuple[tuple[int, ...], asyncio.Task]], key: str, task: asyncio.Task) -> None:
+    """加载结束后移出 in-flight 表。读取一次异常，避免无等待者时出现 'exception was never retrieved'"""
+    if key in inflight and inflight[key][1] is task:
+        inflight.pop(key)
+    if not task.cancelled():
+        task.exception()
 
-def with_cache_async(cache: DBCache, key_type: KeyType):
+
+def with_cache_async(
+        cache: DBCache,
+        key_type: KeyType,
+        tables: Iterable[str] = (),
+        soft_ttl: float | None = None,
+        negative_ttl: float | None = None,
+):
     """
     缓存创建方法装饰器。当缓存中不存在指定数据时调用被装饰函数创建后返回，否则直接返回缓存数据。
     注意：用于构建缓存键的参数必须以关键字形式传入。
+
+    `tables` 声明被装饰函数读取的表名。事务提交后 `DBCache.invalidate_tables` 会移除依赖被写入表的缓存，
+    加载期间这些表被写入时，加载结果只返回给调用者，不写入缓存。
+
+    同一个 key 并发未命中时只执行一次被装饰函数 (single-flight)，其余请求等待同一个加载任务：
+    - 加载抛出的异常会传递给所有等待者
+    - 加载在发起请求的 session 中执行 (保留只读副本路由，不额外占用连接)。
+      等待者被取消 (如客户端断开) 不影响加载；发起请求被取消时加载随之取消，等待者重新发起加载
+    - 调用者事务已写入 `tables` 时不经过缓存
+
+    设置 `soft_ttl` 时启用 stale-while-revalidate：缓存存在超过 `soft_ttl` 后仍直接返回，
+    同时启动一个后台任务通过 `cache.session_factory` 新建 session 刷新缓存。缓存最长存活时间仍为 `cache.ttl`。
+    被装饰函数的 session 参数须命名为 `session`
+
+    设置 `negative_ttl` 时启用负缓存：被装饰函数抛出 `TargetedRecordNotFound` 时缓存该异常 `negative_ttl` 秒，
+    命中时重新抛出。`tables` 中的表被写入 (如插入了目标记录) 时负缓存随之失效
     """
+    tables = tuple(tables)
+    cache.tracked_tables.update(tables)
+
     def decorator(fn):
+        # key: 缓存键, value: (加载开始时的表版本, 正在执行的加载任务)
+        inflight: dict[str, tuple[tuple[int, ...], asyncio.Task]] = {}
+
+        stats = cache.stats.of(key_type)
+
+        def cacheable(version: tuple[int, ...], kwargs) -> bool:
+            """加载期间数据来源未被写入，且不是副本在复制延迟内读到的数据"""
+            if cache.table_version(tables) != version:
+                return False
+            session = kwargs.get("session")
+            return not (
+                session is not None
+                and session.info.get(REPLICA_SESSION)
+                and cache.written_within(tables, cache.replica_lag)
+            )
+
+        async def load(KEY: str, version: tuple[int, ...], args, kwargs):
+            start = time.perf_counter()
+            try:
+                data = await fn(*args, **kwargs)
+            except TargetedRecordNotFound as e:
+                if negative_ttl is not None and cacheable(version, kwargs):
+                    cache.update(
+                        key=KEY,
+                        value=NegativeResult(table=e.table, filter_condition=e.filter_condition),
+                        tables=tables,
+                        key_type=key_type,
+                        ttl=negative_ttl,
+                    )
+                raise
+            finally:
+                stats.load_latency.observe(time.perf_counter() - start)
+            if cacheable(version, kwargs):
+                cache.update(key=KEY, value=data, tables=tables, key_type=key_type)
+            return data
+
+        async def refresh(KEY: str, version: tuple[int, ...], args, kwargs):
+            assert cache.session_factory
+            try:
+                async with cache.session_factory() as session:  # 调用者的 session 在请求结束后关闭, 不可复用
+                    return await load(KEY, version, args, {**kwargs, "session": session})
+            except Exception:
+                logger.warning(f"background cache refresh failed: {KEY}", exc_info=True)
+                raise
+
         @wraps(fn)
         async def wrapped_fn(*args, **kwargs):
             KEY = KeyFactory.get(key_type=key_type, **kwargs)
-            cache_data = cache.get(KEY)
-            if cache_data is not None:
-                data = cache_data
-            else:
-                data = await fn(*args, **kwargs)
-                cache.update(key=KEY, value=data)
-            return data
+            entry = cache.get_entry(KEY)
+            if entry is not None:
+                stats.hits += 1
+                if isinstance(entry.value, NegativeResult):
+                    stats.negative_hits += 1
+                    raise entry.value.error()
+                if (
+                    soft_ttl is not None
+                    and cache.session_factory is not None
+                    and time.time() - entry.created >= soft_ttl
+                    and KEY not in inflight
+                ):
+                    stats.refreshes += 1
+                    version = cache.table_version(tables)
+                    task = asyncio.create_task(refresh(KEY, version, args, kwargs))
+                    inflight[KEY] = (version, task)
+                    task.add_done_callback(partial(_finish_load, inflight, KEY))
+                return entry.value
+            stats.misses += 1
+            session = kwargs.get("session")
+            if session is not None and not session.info.get(DIRTY_TABLES, set()).isdisjoint(tables):
+                # 本事务已写入数据来源表，未提交的数据只对调用者的 session 可见，直接查询且不写入缓存
+                return await fn(*args, **kwargs)
+            while True:
+                version = cache.table_version(tables)
+                if KEY in inflight and inflight[KEY][0] == version and not inflight[KEY][1].done():
+                    task = inflight[KEY][1]
+                else:  # 无加载任务，或加载开始后数据来源已被写入
+                    task = asyncio.create_task(load(KEY, version, args, kwargs))
+                    inflight[KEY] = (version, task)
+                    task.add_done_callback(partial(_finish_load, inflight, KEY))
+                    return await task  # 使用本请求的 session, 本请求被取消时加载随之取消
+                try:
+                    return await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    current = asyncio.current_task()
+                    if not task.cancelled() or (current is not None and current.cancelling()):
+                        raise
+                    # 发起加载的请求已被取消，由本请求重新加载
         return wrapped_fn
     return decorator
-
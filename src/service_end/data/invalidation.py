@@ -0,0 +1,126 @@
+# data.invalidation
+# 跨进程缓存一致性：写事务提交时通过 Postgres NOTIFY 广播被写入的表，
+# 每个 worker 持有一条 LISTEN 连接，收到通知后使本进程内依赖这些表的缓存失效
+from .cache import DBCache, replace_items
+import json
+import uuid
+import random
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Iterable
+from sqlalchemy import select, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection, AsyncSession
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_MAX_DELAY = 30.  # LISTEN 连接断开后重连的最大退避间隔, 单位 sec
+PAYLOAD_LIMIT = 7999  # NOTIFY payload 字节上限 (Postgres 默认 8000)
+
+
+class InvalidationBus:
+    """
+    缓存失效广播
+
+    - `notify` 在写事务内执行 `pg_notify`，Postgres 只在事务提交后投递通知，回滚时不投递。
+      通知可附带列表缓存的元素替换，收到的 worker 写穿更新这些缓存而不是移除；超出 payload 上限时只广播表名
+    - `start` 从 engine 连接池取出一条连接执行 LISTEN，连接断开后自动重连。
+      断开期间可能漏收通知，重连成功后清空本进程缓存
+
+    Attributes:
+        cache (DBCache): 本进程缓存
+        channel (str): NOTIFY 频道名
+        origin (str): 本进程标识，用于忽略自己发出的通知
+    """
+
+    def __init__(self, cache: DBCache, channel: str):
+        self.cache = cache
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.__engine: AsyncEngine | None = None
+        self.__conn: AsyncConnection | None = None
+        self.__reconnect_task: asyncio.Task | None = None
+        self.__closing = False
+
+    async def notify(
+            self,
+            session: AsyncSession,
+            tables: Iterable[str],
+            replaces: dict[str, list[tuple[str, dict[str, Any]]]] | None = None,
+    ) -> None:
+        """在当前事务内广播被写入的表与列表缓存的元素替换 (见 `stage_item_replace`)，提交后生效"""
+        message: dict[str, Any] = {"origin": self.origin, "tables": sorted(tables)}
+        payload = json.dumps({**message, "replaces": replaces}) if replaces else ""
+        if not payload or len(payload.encode("utf-8")) > PAYLOAD_LIMIT:
+            payload = json.dumps(message)
+        await session.execute(select(func.pg_notify(self.channel, payload)))
+
+    async def start(self, engine: AsyncEngine) -> None:
+        """建立 LISTEN 连接"""
+        self.__engine = engine
+        self.__closing = False
+        await self.__listen()
+
+    async def stop(self) -> None:
+        """关闭 LISTEN 连接"""
+        self.__closing = True
+        if self.__reconnect_task is not None:
+            self.__reconnect_task.cancel()
+            self.__reconnect_task = None
+        if self.__conn is not None:
+            conn, self.__conn = self.__conn, None
+            try:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.remove_listener(self.channel, self.__on_notify)
+            except Exception:
+                logger.warning("remove cache invalidation listener failed", exc_info=True)
+            await conn.close()
+
+    async def __listen(self) -> None:
+        assert self.__engine
+        conn = await self.__engine.connect()
+        try:
+            raw = await conn.get_raw_connection()
+            driver_conn = raw.driver_connection
+            await driver_conn.add_listener(self.channel, self.__on_notify)
+            driver_conn.add_termination_listener(self.__on_terminate)
+        except Exception:
+            await conn.close()
+            raise
+        self.__conn = conn
+        logger.info(f"cache invalidation bus listening on '{self.channel}'")
+
+    def __on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            if message["origin"] == self.origin:  # 本进程提交时已经失效过
+                return
+            patches = {
+                key: partial(replace_items, [(attr, data) for attr, data in replacements])
+                for key, replacements in message.get("replaces", {}).items()
+            }
+            self.cache.invalidate_tables(message["tables"], patches=patches)
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"invalid cache invalidation payload: {payload!r}")
+
+    def __on_terminate(self, connection) -> None:
+        if self.__closing:
+            return
+        logger.warning("cache invalidation connection lost, reconnecting")
+        self.__conn = None
+        if self.__reconnect_task is None or self.__reconnect_task.done():
+            self.__reconnect_task = asyncio.get_running_loop().create_task(self.__reconnect())
+
+    async def __reconnect(self) -> None:
+        delay = 1.
+        while not self.__closing:
+            try:
+                await self.__listen()
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning(f"cache invalidation reconnect failed: {e}")
+                await asyncio.sleep(delay * (1 + random.random()))
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            self.cache.clear()  # 断开期间的通知已丢失
+            return
@@ -0,0 +1,119 @@
+# data.migration
+# 版本化 schema 迁移
+#
+# `create_all` 只会创建缺失的表，不会修改已有表的列与索引。已有数据库的结构演进通过这里登记的迁移完成:
+# - 每个迁移是一个带版本号的异步函数，版本号严格递增
+# - 当前版本记录在 variable 表的 SCHEMA_VERSION 中，启动时按顺序执行所有更高版本的迁移，每个迁移单独提交
+# - 新建的表由 create_all 按当前 ORM 直接建出，迁移同样会在其上执行一遍，因此迁移必须可重复执行 (IF NOT EXISTS 等)
+# - 多个进程同时启动时以 advisory lock 串行化
+# 修改 orm.py 的表结构时，在这里追加一个迁移，使已有数据库达到与 create_all 相同的结构
+from .orm import Variable
+from .utils import VariableEnum, question_content_hash
+from sqlalchemy import text, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from typing import Awaitable, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = 0x6d696772  # pg_advisory_lock 的键
+BACKFILL_CHUNK = 1000
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+MIGRATIONS: list[tuple[int, str, Migration]] = []
+
+
+def migration(version: int, description: str) -> Callable[[Migration], Migration]:
+    """登记一个迁移"""
+    def decorator(func: Migration) -> Migration:
+        assert not MIGRATIONS or MIGRATIONS[-1][0] < version, "migration versions must increase"
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+async def _constraint_exists(conn: AsyncConnection, name: str) -> bool:
+    result = await conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name})
+    return result.first() is not None
+
+
+@migration(1, "question.content_hash with per sub-domain unique constraint")
+async def _question_content_hash(conn: AsyncConnection) -> None:
+    await conn.execute(text("ALTER TABLE question ADD COLUMN IF NOT EXISTS content_hash CHAR(64)"))
+    # 回填旧数据的哈希，规范化规则与写入时一致
+    while True:
+        result = await conn.execute(
+            text("SELECT id, question FROM question WHERE content_hash IS NULL LIMIT :n"), {"n": BACKFILL_CHUNK}
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await conn.execute(
+            text("UPDATE question SET content_hash = :hash WHERE id = :id"),
+            [{"id": id_, "hash": question_content_hash(question)} for id_, question in rows],
+        )
+    # 同一子领域内的重复题目只保留最早的一条
+    await conn.execute(text(
+        "DELETE FROM question a USING question b "
+        "WHERE a.domain_id = b.domain_id AND a.sub_domain_id = b.sub_domain_id "
+        "AND a.content_hash = b.content_hash AND a.id > b.id"
+    ))
+    await conn.execute(text("ALTER TABLE question ALTER COLUMN content_hash SET NOT NULL"))
+    if not await _constraint_exists(conn, "question_domain_id_sub_domain_id_content_hash_key"):
+        await conn.execute(text(
+            "ALTER TABLE question ADD CONSTRAINT question_domain_id_sub_domain_id_content_hash_key "
+            "UNIQUE (domain_id, sub_domain_id, content_hash)"
+        ))
+
+
+@migration(2, "foreign key and array GIN indexes")
+async def _hot_path_indexes(conn: AsyncConnection) -> None:
+    # question(domain_id, sub_domain_id) 由版本 1 的唯一约束的前缀覆盖，无需单独建索引
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_interviewer_model ON interviewer (model)"))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_cv_skills ON cv USING gin (skills)"))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_job_job_requirements ON job USING gin (job_requirements)"))
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def _schema_version(conn: AsyncConnection) -> int:
+    value = await conn.scalar(
+        select(Variable.value).where(Variable.name == VariableEnum.SCHEMA_VERSION.value)
+    )
+    return value["value"] if value is not None else 0
+
+
+async def _set_schema_version(conn: AsyncConnection, version: int) -> None:
+    dml_stmt = pg_insert(Variable).values(name=VariableEnum.SCHEMA_VERSION.value, value={"value": version})
+    dml_stmt = dml_stmt.on_conflict_do_update(index_elements=[Variable.name], set_={"value": dml_stmt.excluded.value})
+    await conn.execute(dml_stmt)
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """
+    执行所有未应用的迁移，每个迁移与版本号更新在同一事务内提交。
+    调用前需已通过 create_all 建好表并提交。迁移期间独占一个连接以持有 advisory lock
+
+    Returns:
+        本次执行的迁移个数
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK})
+        await conn.commit()
+        try:
+            applied = 0
+            for version, description, func in MIGRATIONS:
+                async with conn.begin():
+                    if version <= await _schema_version(conn):
+                        continue
+                    logger.info(f"applying schema migration {version}: {description}")
+                    await conn.execute(text("SET LOCAL statement_timeout = 0"))  # 回填与建索引可能超过常规语句超时
+                    await func(conn)
+                    await _set_schema_version(conn, version)
+                applied += 1
+            return applied
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK})
+            await conn.commit()
@@ -1,5 +1,9 @@
 # data.model
 from pydantic import BaseModel, Field, ConfigDict
+from typing import Any, Generic, TypeVar
+from datetime import datetime
+
+T = TypeVar("T")
 
 
 class ORMBaseModel(BaseModel):
@@ -29,6 +33,28 @@ class DomainQuestionBank(BaseModel):
     question_ids: dict[str, list[int]] | None = Field(default=None)  # key: sub_domain, val: question_indices_list
 
  
+class UpsertResult(BaseModel):
+    """批量写入的逐行结果统计"""
+    inserted: int = 0  # 新插入
+    updated: int = 0   # 冲突后更新
+    skipped: int = 0   # 冲突后跳过 (含同一批内的重复行)
+
+
+class ImportChunkProgress(BaseModel):
+    """批量导入的单批进度"""
+    chunk: int       # 批次序号, 从 1 开始
+    rows: int        # 本批行数
+    skipped: int     # 本批因重复而跳过的行数
+    total_rows: int  # 累计行数
+    elapsed: float   # 累计耗时, 单位 sec
+
+
+class Page(BaseModel, Generic[T]):
+    """按主键的游标分页结果。`next_cursor` 为 None 时已到末页，否则作为下一页的 `after` 参数"""
+    items: list[T]
+    next_cursor: str | None = None
+
+
 # 岗位
 class JobModel(ORMBaseModel):
     name: str = Field(max_length=20)  # 名称
@@ -86,3 +112,15 @@ class InterviewResponse(BaseModel):
     """面试记录与总结"""
     
 
+
+# 后台任务
+class TaskModel(ORMBaseModel):
+    """后台任务状态。`progress` 为 {步骤名: 状态}，如题目生成任务的步骤为各子领域"""
+    id: int = Field(validation_alias="id_")
+    kind: str
+    status: str
+    params: dict[str, Any] = Field(exclude=True)  # 任务参数, 可能较大, 不随状态返回
+    progress: dict[str, str]
+    error: str | None = None
+    created_at: datetime
+    heartbeat: datetime
@@ -1,17 +1,56 @@
 # data.operation
 # 无状态数据库 Operator 类
 # 无需进行手动的 session 上下文管理，交给 fastapi
-from ..exception import ServiceInitException, QueryError, TargetedRecordNotFound, UpdateEmpty
-from .model import QuestionModel, DomainQuestionBank, JobModel, CVModel, InterviewerModel, LLMCard
+# 无需手动维护缓存：写入经 insert/update/delete_execute 登记表名，事务提交后自动使依赖这些表的缓存失效
+from ..exception import ServiceInitException, QueryError, TargetedRecordNotFound
+from .model import (
+    QuestionModel, DomainQuestionBank, JobModel, CVModel, InterviewerModel, LLMCard, ImportChunkProgress, UpsertResult,
+    Page, TaskModel,
+)
 from .cache import DBCache, with_cache_async, KeyType, KeyFactory
-from .orm import Variable, Question, Domain, Job, CV, Interviewer, LLM
-from .utils import VariableEnum, query_one_record, insert_execute, update_execute, delete_execute, check_empty
-from sqlalchemy import exc, select, insert, update, delete
+from .orm import DOMAIN_ID_SEQ, Question, Domain, Job, CV, Interviewer, LLM, BackgroundTask
+from .utils import (
+    OnConflict, TaskStatus, query_one_record, insert_execute, upsert_execute, update_execute, update_returning,
+    delete_execute, copy_execute, question_content_hash, stage_item_replace,
+)
+from sqlalchemy import exc, select, insert, update, delete, text, table, column, func, cast, ARRAY, Select
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from array import array
+from itertools import islice
+from typing import Iterable, Any, AsyncIterator
+from datetime import timedelta
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUESTION_UNIQUE = ("domain_id", "sub_domain_id", "content_hash")  # Question 去重键
+QUESTION_COLUMNS = ("domain_id", "sub_domain_id", *QuestionModel.model_fields, "content_hash")  # 除 id 外的列
+QUESTION_STAGING = "question_import"  # 流式导入使用的临时表
+STREAM_YIELD_PER = 500  # 流式查询时服务端游标每次取回的行数
+
+
+def _claimable(lease: float):
+    """可领取的后台任务：待执行，或执行中但超过 lease 秒未刷新心跳 (执行进程已退出)"""
+    stale = BackgroundTask.heartbeat < func.now() - timedelta(seconds=lease)
+    return (BackgroundTask.status == TaskStatus.PENDING.value) | (
+        (BackgroundTask.status == TaskStatus.RUNNING.value) & stale
+    )
+
 
 try:
     from ..configs import CACHE_CONFIG
-    global_cache = DBCache(size=CACHE_CONFIG["cache_size"], ttl=CACHE_CONFIG["cache_ttl"])
+    global_cache = DBCache(
+        size=CACHE_CONFIG["cache_size"],
+        ttl=CACHE_CONFIG["cache_ttl"],
+        max_bytes=CACHE_CONFIG.get("cache_max_bytes"),
+        max_entry_bytes=CACHE_CONFIG.get("cache_max_entry_bytes"),
+    )
+    SOFT_TTL = CACHE_CONFIG.get("cache_soft_ttl")  # ALL_* 列表缓存的后台刷新时间, 未配置时不刷新
+    NEGATIVE_TTL = CACHE_CONFIG.get("cache_negative_ttl")  # 记录不存在的负缓存存活时间, 未配置时不缓存
 except KeyError as e:
     raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
 
@@ -25,49 +64,48 @@ class InsertOperator:
     [admin] 创建 domain
     domain(model: DomainQuestionBank) -> None
 
-    [admin] 批量插入 Question。domain_name, sub_domain_name 代表 Question 所属领域
-    question_batch(domain_name: str, sub_domain_name: str, models: list[QuestionModel]) -> None
+    [admin] 批量插入 Question。domain_name, sub_domain_name 代表 Question 所属领域，题干重复的题目默认跳过
+    question_batch(domain_name: str, sub_domain_name: str, models: list[QuestionModel], on_conflict: OnConflict) -> UpsertResult
+
+    [admin] 流式批量导入 Question (COPY)。rows 为 (domain_name, sub_domain_name, QuestionModel)
+    question_stream(rows: Iterable[tuple[str, str, QuestionModel]], chunk_size: int) -> list[ImportChunkProgress]
 
     [admin] 创建 job
-    job(model: JobModel) -> None
+    job(model: JobModel, on_conflict: OnConflict) -> UpsertResult
 
     [admin/user] 批量插入 cv
-    cv_batch(models: list[CVModel]) -> None
+    cv_batch(models: list[CVModel], on_conflict: OnConflict) -> UpsertResult
 
     [admin] 创建 interviewer
     interviewer(model: InterviewerModel, llm_card: LLMCard) -> None
 
     [admin] 创建 LLM
-    llm(llm_card: LLMCard) -> None
+    llm(llm_card: LLMCard, on_conflict: OnConflict) -> UpsertResult
+
+    [admin] 创建后台任务，steps 为任务的步骤名
+    task(kind: str, params: dict, steps: list[str]) -> TaskModel
     ```
+
+    `on_conflict` 为主键/唯一约束冲突时的处理方式: error 整批失败, skip 跳过冲突行, update 覆盖冲突行
     """
 
     async def domain(self, session: AsyncSession, model: DomainQuestionBank):
         """创建不带 Question 的 Domain"""
-        # 查询当前已有 domain 数量, 加锁
-        dql_stmt = select(Variable).where(Variable.name == VariableEnum.DOMAIN_COUNT.value).with_for_update()
-        data = await query_one_record(
-            dql_stmt=dql_stmt,
-            session=session,
-            table=Variable.__tablename__
-        )
-        domain_count = data.value["value"]  # {"value": number_of_domain}
-        if not isinstance(domain_count, int):
-            raise TargetedRecordNotFound(
-                table=Variable.__tablename__,
-                not_found_filter_condition=str(dql_stmt.whereclause)
-            )
-
-        # 更新 domain_count
-        domain_count += 1
-        dml_stmt = update(Variable).where(Variable.name == VariableEnum.DOMAIN_COUNT.value).values(value={"value": domain_count})
-        await session.execute(statement=dml_stmt)
+        # 从序列分配 domain_id, 不加锁。事务回滚时序列值不回退, id 可能不连续
+        try:
+            domain_id = await session.scalar(select(DOMAIN_ID_SEQ.next_value()))
+        except exc.SQLAlchemyError as e:
+            raise QueryError(
+                source_class=e.__class__.__name__,
+                table=DOMAIN_ID_SEQ.name,
+                filter_condition="nextval"
+            ) from e
 
         # 插入新 domain 记录
         nrows = len(model.sub_domains)
         data = [
             {
-                "domain_id": domain_count,
+                "domain_id": domain_id,
                 "sub_domain_id": idx + 1,
                 "domain_name": model.domain,
                 "sub_domain_name": model.sub_domains[idx]
@@ -77,22 +115,11 @@ class InsertOperator:
         dml_stmt = insert(Domain).values(data)
         await insert_execute(dml_stmt=dml_stmt, session=session, table=Domain.__tablename__)
 
-        # 更新缓存
-        global_cache.batch_update(    
-            {
-                KeyFactory.get(
-                    KeyType.DOMAIN_SUBDOMAIN,
-                    domain_name=domain['domain_name'],
-                    sub_domain_name=domain['sub_domain_name']
-                ): (domain['domain_id'], domain['sub_domain_id'],)
-                for domain in data
-            }
-        )
-        global_cache.pop(KeyFactory.get(key_type=KeyType.ALL_DOMAIN_NAME))
-
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.DOMAIN_SUBDOMAIN
+        key_type=KeyType.DOMAIN_SUBDOMAIN,
+        tables=(Domain.__tablename__,),
+        negative_ttl=NEGATIVE_TTL,
     )
     async def _get_domain_subdomain_id(
             self,
@@ -116,9 +143,13 @@ class InsertOperator:
             session: AsyncSession,
             domain_name: str,
             sub_domain_name: str,
-            models: list[QuestionModel]
-    ):
-        """批量插入 Question。`domain_name`,`sub_domain_name` 代表 Question 所属领域"""
+            models: list[QuestionModel],
+            on_conflict: OnConflict = OnConflict.SKIP,
+    ) -> UpsertResult:
+        """
+        批量插入 Question。`domain_name`,`sub_domain_name` 代表 Question 所属领域。
+        同一子领域内题干 (content_hash) 重复视为冲突
+        """
         # 获取 domain/sub_domain 的 id
         domain_id, sub_domain_id = await self._get_domain_subdomain_id(
             session=session,
@@ -127,37 +158,154 @@ class InsertOperator:
         )
         # 执行插入
         domain_dict = {"domain_id": domain_id, "sub_domain_id": sub_domain_id}
-        data = [dict(**domain_dict, **model.model_dump()) for model in models]
-        dml_stmt = insert(Question).values(data)
-        await insert_execute(session=session, dml_stmt=dml_stmt, table=Question.__tablename__)
+        data = [
+            dict(**domain_dict, **model.model_dump(), content_hash=question_content_hash(model.question))
+            for model in models
+        ]
+        return await upsert_execute(
+            session=session,
+            Data=Question,
+            data=data,
+            on_conflict=on_conflict,
+            index_elements=QUESTION_UNIQUE,
+            update_columns=tuple(QuestionModel.model_fields),
+        )
     
-    async def job(self, session: AsyncSession, model: JobModel):
+    async def question_stream(
+            self,
+            session: AsyncSession,
+            rows: Iterable[tuple[str, str, QuestionModel]],
+            chunk_size: int,
+    ) -> list[ImportChunkProgress]:
+        """
+        流式批量导入 Question。`rows` 按 `chunk_size` 分批通过二进制 COPY 写入，内存占用与批大小相关、与总行数无关。
+        domain/sub_domain 的 id 在导入开始时一次查询，全部批次在同一事务内。
+
+        每批先 COPY 进事务级临时表，再 `INSERT ... SELECT ... ON CONFLICT DO NOTHING` 写入 question，
+        题干重复的行被跳过
+        """
+        # 一次查询所有 domain/sub_domain 的 id, 同时开启事务
+        result = await session.execute(
+            select(Domain.domain_name, Domain.sub_domain_name, Domain.domain_id, Domain.sub_domain_id)
+        )
+        domain_ids = {
+            (row.domain_name, row.sub_domain_name): (row.domain_id, row.sub_domain_id)
+            for row in result.all()
+        }
+
+        await session.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {QUESTION_STAGING} ON COMMIT DROP AS "
+            f"SELECT {', '.join(QUESTION_COLUMNS)} FROM {Question.__tablename__} WITH NO DATA"
+        ))
+        staging = table(QUESTION_STAGING, *(column(c) for c in QUESTION_COLUMNS))
+        dml_stmt = (
+            pg_insert(Question)
+            .from_select(QUESTION_COLUMNS, select(staging))
+            .on_conflict_do_nothing(index_elements=QUESTION_UNIQUE)
+        )
+
+        progress: list[ImportChunkProgress] = []
+        total_rows = 0
+        start = time.perf_counter()
+        iterator = iter(rows)
+        while chunk := list(islice(iterator, chunk_size)):
+            records = []
+            for domain_name, sub_domain_name, model in chunk:
+                ids = domain_ids.get((domain_name, sub_domain_name))
+                if ids is None:
+                    raise TargetedRecordNotFound(
+                        table=Domain.__tablename__,
+                        not_found_filter_condition=f"domain_name={domain_name}, sub_domain_name={sub_domain_name}"
+                    )
+                records.append((*ids, *model.model_dump().values(), question_content_hash(model.question)))
+            await copy_execute(
+                session=session,
+                table=QUESTION_STAGING,
+                columns=QUESTION_COLUMNS,
+                records=records,
+                temporary=True,
+            )
+            result = await insert_execute(session=session, dml_stmt=dml_stmt, table=Question.__tablename__)
+            await session.execute(text(f"TRUNCATE {QUESTION_STAGING}"))
+
+            total_rows += len(records)
+            progress.append(
+                ImportChunkProgress(
+                    chunk=len(progress) + 1,
+                    rows=len(records),
+                    skipped=len(records) - result.rowcount,
+                    total_rows=total_rows,
+                    elapsed=time.perf_counter() - start,
+                )
+            )
+            logger.info(f"question import chunk {len(progress)}: {total_rows} rows")
+        return progress
+
+    async def job(
+            self,
+            session: AsyncSession,
+            model: JobModel,
+            on_conflict: OnConflict = OnConflict.ERROR,
+    ) -> UpsertResult:
         """创建 job"""
-        data = [model.model_dump()]
-        dml_stmt = insert(Job).values(data)
-        await insert_execute(session=session, dml_stmt=dml_stmt, table=Job.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_JOB))
+        return await upsert_execute(
+            session=session,
+            Data=Job,
+            data=[model.model_dump()],
+            on_conflict=on_conflict,
+            index_elements=("name",),
+            update_columns=("job_requirements", "job_responsibilities"),
+        )
 
-    async def cv_batch(self, session: AsyncSession, models: list[CVModel]):
+    async def cv_batch(
+            self,
+            session: AsyncSession,
+            models: list[CVModel],
+            on_conflict: OnConflict = OnConflict.ERROR,
+    ) -> UpsertResult:
         """批量插入 cv"""
-        data = [model.model_dump() for model in models]
-        dml_stmt = insert(CV).values(data)
-        await insert_execute(session=session, dml_stmt=dml_stmt, table=CV.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_CV_TITLE))
+        return await upsert_execute(
+            session=session,
+            Data=CV,
+            data=[model.model_dump() for model in models],
+            on_conflict=on_conflict,
+            index_elements=("title",),
+            update_columns=("basic_info", "skills", "project_experience"),
+        )
     
     async def interviewer(self, session: AsyncSession, model: InterviewerModel):
         """创建 interviewer"""
         data = [model.model_dump()]
         dml_stmt = insert(Interviewer).values(data)
         await insert_execute(session=session, dml_stmt=dml_stmt, table=Interviewer.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_INTERVIEWER))
 
-    async def llm(self, session: AsyncSession, llm_card: LLMCard):
-        """创建 llm"""
-        data = [llm_card.model_dump()]
-        dml_stmt = insert(LLM).values(data)
-        await insert_execute(session=session, dml_stmt=dml_stmt, table=LLM.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_LLM))
+    async def llm(
+            self,
+            session: AsyncSession,
+            llm_card: LLMCard,
+            on_conflict: OnConflict = OnConflict.ERROR,
+    ) -> UpsertResult:
+        """创建 llm。冲突更新时保留已累计的 cost"""
+        return await upsert_execute(
+            session=session,
+            Data=LLM,
+            data=[llm_card.model_dump()],
+            on_conflict=on_conflict,
+            index_elements=("model",),
+            update_columns=("is_local", "path", "cost_limit"),
+        )
+
+    async def task(self, session: AsyncSession, kind: str, params: dict[str, Any], steps: list[str]) -> TaskModel:
+        """创建后台任务，全部步骤为 pending"""
+        value = {
+            "kind": kind,
+            "status": TaskStatus.PENDING.value,
+            "params": params,
+            "progress": {step: TaskStatus.PENDING.value for step in steps},
+        }
+        dml_stmt = insert(BackgroundTask).values(**value).returning(BackgroundTask)
+        result = await insert_execute(session=session, dml_stmt=dml_stmt, table=BackgroundTask.__tablename__)
+        return TaskModel.model_validate(result.scalar_one())
 
 
 class GetOperator:
@@ -175,6 +323,9 @@ class GetOperator:
     [user] 按照领域名称加载 DomainQuestionBank
     domain_question_bank(domain_name: str) -> DomainQuestionBank
 
+    [user] 从一个子领域不放回地随机抽取 k 道题
+    sample_questions(domain_name: str, sub_domain_name: str, k: int) -> list[QuestionModel]
+
     [admin] 查询当前所有 Job
     all_job() -> list[JobModel]
 
@@ -189,9 +340,63 @@ class GetOperator:
 
     [admin] 查询当前全部 Interviewer
     all_interviewer() -> list[InterviewerModel]
+
+    [admin] 查询后台任务状态，不经过缓存
+    task(task_id: int) -> TaskModel
+
+    [admin] 待执行、或执行进程超过 lease 秒未刷新心跳的后台任务 id
+    resumable_tasks(lease: float) -> list[int]
+
+    [admin] 按主键游标分页，after 为上一页的 next_cursor，不经过缓存
+    job_page(after: str | None, limit: int) -> Page[JobModel]
+    cv_title_page(after: str | None, limit: int) -> Page[str]
+    llm_page(after: str | None, limit: int) -> Page[LLMCard]
+    interviewer_page(after: str | None, limit: int) -> Page[InterviewerModel]
+
+    [admin] 通过服务端游标按主键顺序逐行迭代，内存占用与表大小无关
+    stream_job() -> AsyncIterator[JobModel]
+    stream_cv_title() -> AsyncIterator[str]
+    stream_llm() -> AsyncIterator[LLMCard]
+    stream_interviewer() -> AsyncIterator[InterviewerModel]
     ```
     """
 
+    @staticmethod
+    async def _keyset_page(
+            session: AsyncSession,
+            dql_stmt: Select,
+            key: InstrumentedAttribute,
+            after: str | None,
+            limit: int,
+    ) -> list[Any]:
+        """取 `key > after` 的前 limit 行"""
+        if after is not None:
+            dql_stmt = dql_stmt.where(key > after)
+        dql_stmt = dql_stmt.order_by(key).limit(limit)
+        try:
+            results = await session.scalars(dql_stmt)
+        except exc.SQLAlchemyError as e:
+            raise QueryError(
+                source_class=e.__class__.__name__,
+                table=key.class_.__tablename__,
+                filter_condition=f"{key.key} > {after}"
+            ) from e
+        return list(results.all())
+
+    @staticmethod
+    async def _stream(session: AsyncSession, dql_stmt: Select, table: str) -> AsyncIterator[Any]:
+        """以服务端游标逐行迭代查询结果"""
+        try:
+            results = await session.stream_scalars(dql_stmt.execution_options(yield_per=STREAM_YIELD_PER))
+            async for row in results:
+                yield row
+        except exc.SQLAlchemyError as e:
+            raise QueryError(
+                source_class=e.__class__.__name__,
+                table=table,
+                filter_condition="none"
+            ) from e
+
     async def questions(self, session: AsyncSession, ids: list[int]) -> list[QuestionModel]:
         """从数据库按主键 ID 加载一组 QuestionModel"""
         dql_stmt = select(Question).where(Question.id_.in_(ids))
@@ -214,7 +419,9 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.ALL_DOMAIN_NAME
+        key_type=KeyType.ALL_DOMAIN_NAME,
+        tables=(Domain.__tablename__,),
+        soft_ttl=SOFT_TTL,
     )
     async def all_domain_name(self, session: AsyncSession) -> list[str]:
         """当前数据库内已有领域题库的领域名称"""
@@ -232,14 +439,19 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.QUESTION_BANK
+        key_type=KeyType.QUESTION_BANK,
+        tables=(Domain.__tablename__, Question.__tablename__),
     )
     async def domain_question_bank(self, session: AsyncSession, domain_name: str) -> DomainQuestionBank:
-        """按照领域名称加载 DomainQuestionBank"""
-        from collections import defaultdict
-        # 查询 (id_, sub_domain_name)
+        """按照领域名称加载 DomainQuestionBank。分组在数据库端完成，每个子领域只返回一行 id 数组"""
         where_clause = (Domain.domain_name == domain_name)
-        dql_stmt = select(Question.id_, Domain.sub_domain_name).join(Domain).where(where_clause)
+        dql_stmt = (
+            select(Domain.sub_domain_name, func.array_agg(aggregate_order_by(Question.id_, Question.id_)))
+            .join(Question)
+            .where(where_clause)
+            .group_by(Domain.sub_domain_id, Domain.sub_domain_name)
+            .order_by(Domain.sub_domain_id)
+        )
         try:
             result = await session.execute(dql_stmt)
         except exc.SQLAlchemyError as e:
@@ -249,10 +461,7 @@ class GetOperator:
                 filter_condition=str(where_clause)
             ) from e
 
-        # 构建 DomainQuestionBank
-        question_ids: dict[str, list[int]] = defaultdict(list)
-        for row in result.all():
-            question_ids[row.sub_domain_name].append(row.id_)
+        question_ids: dict[str, list[int]] = dict(result.tuples().all())
         return DomainQuestionBank(
             domain=domain_name,
             sub_domains=list(question_ids.keys()),
@@ -261,7 +470,48 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.ALL_JOB
+        key_type=KeyType.QUESTION_IDS,
+        tables=(Domain.__tablename__, Question.__tablename__),
+    )
+    async def _question_ids(self, session: AsyncSession, domain_name: str, sub_domain_name: str) -> array:
+        """子领域全部 question id，以紧凑的 int64 数组缓存"""
+        where_clause = (Domain.domain_name == domain_name) & (Domain.sub_domain_name == sub_domain_name)
+        dql_stmt = select(Question.id_).join(Domain).where(where_clause).order_by(Question.id_)
+        try:
+            results = await session.scalars(dql_stmt)
+        except exc.SQLAlchemyError as e:
+            raise QueryError(
+                source_class=e.__class__.__name__,
+                table="question.join(domain)",
+                filter_condition=str(where_clause)
+            ) from e
+        return array("q", results.all())
+
+    async def sample_questions(
+            self,
+            session: AsyncSession,
+            domain_name: str,
+            sub_domain_name: str,
+            k: int,
+    ) -> list[QuestionModel]:
+        """
+        从一个子领域不放回地随机抽取 k 道题，题目数量不足 k 时返回全部题目。
+        抽样只在缓存的 id 数组上进行，开销与 k 相关、与题库大小无关，之后按主键一次查询题目
+        """
+        ids = await self._question_ids(session=session, domain_name=domain_name, sub_domain_name=sub_domain_name)
+        if len(ids) == 0:
+            raise TargetedRecordNotFound(
+                table="question.join(domain)",
+                not_found_filter_condition=f"domain_name={domain_name}, sub_domain_name={sub_domain_name}"
+            )
+        sampled = random.sample(ids, min(k, len(ids)))
+        return await self.questions(session=session, ids=sampled)
+
+    @with_cache_async(
+        cache=global_cache,
+        key_type=KeyType.ALL_JOB,
+        tables=(Job.__tablename__,),
+        soft_ttl=SOFT_TTL,
     )
     async def all_job(self, session: AsyncSession) -> list[JobModel]:
         """查询当前所有 Job"""
@@ -278,7 +528,9 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.CV_TITLE
+        key_type=KeyType.CV_TITLE,
+        tables=(CV.__tablename__,),
+        negative_ttl=NEGATIVE_TTL,
     )
     async def cv(self, session: AsyncSession, title: str) -> CVModel:
         """查询一个 cv"""
@@ -292,7 +544,8 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.ALL_CV_TITLE
+        key_type=KeyType.ALL_CV_TITLE,
+        tables=(CV.__tablename__,),
     )
     async def all_cv_titles(self, session: AsyncSession) -> list[str]:
         """查询当前所有 cv 的名称"""
@@ -309,7 +562,9 @@ class GetOperator:
     
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.ALL_LLM
+        key_type=KeyType.ALL_LLM,
+        tables=(LLM.__tablename__,),
+        soft_ttl=SOFT_TTL,
     )
     async def all_llm(self, session: AsyncSession) -> list[LLMCard]:
         """查询当前全部 LLM"""
@@ -326,7 +581,9 @@ class GetOperator:
 
     @with_cache_async(
         cache=global_cache,
-        key_type=KeyType.ALL_INTERVIEWER
+        key_type=KeyType.ALL_INTERVIEWER,
+        tables=(Interviewer.__tablename__,),
+        soft_ttl=SOFT_TTL,
     )
     async def all_interviewer(self, session: AsyncSession) -> list[InterviewerModel]:
         """查询当前全部 Interviewer"""
@@ -341,10 +598,85 @@ class GetOperator:
             ) from e
         return [InterviewerModel.model_validate(interviewer) for interviewer in results.all()]
 
+    async def task(self, session: AsyncSession, task_id: int) -> TaskModel:
+        """查询后台任务状态"""
+        dql_stmt = select(BackgroundTask).where(BackgroundTask.id_ == task_id)
+        task: BackgroundTask = await query_one_record(
+            dql_stmt=dql_stmt,
+            session=session,
+            table=BackgroundTask.__tablename__
+        )
+        return TaskModel.model_validate(task)
+
+    async def resumable_tasks(self, session: AsyncSession, lease: float) -> list[int]:
+        """可领取的后台任务 id，按创建顺序"""
+        where_clause = _claimable(lease)
+        dql_stmt = select(BackgroundTask.id_).where(where_clause).order_by(BackgroundTask.id_)
+        try:
+            results = await session.scalars(dql_stmt)
+        except exc.SQLAlchemyError as e:
+            raise QueryError(
+                source_class=e.__class__.__name__,
+                table=BackgroundTask.__tablename__,
+                filter_condition=str(where_clause)
+            ) from e
+        return list(results.all())
+
+    async def job_page(self, session: AsyncSession, after: str | None, limit: int) -> Page[JobModel]:
+        """按 Job.name 游标分页"""
+        jobs = await self._keyset_page(session, select(Job), Job.name, after, limit)
+        return Page[JobModel](
+            items=[JobModel.model_validate(job) for job in jobs],
+            next_cursor=jobs[-1].name if len(jobs) == limit else None,
+        )
+
+    async def cv_title_page(self, session: AsyncSession, after: str | None, limit: int) -> Page[str]:
+        """按 CV.title 游标分页"""
+        titles = await self._keyset_page(session, select(CV.title), CV.title, after, limit)
+        return Page[str](items=titles, next_cursor=titles[-1] if len(titles) == limit else None)
+
+    async def llm_page(self, session: AsyncSession, after: str | None, limit: int) -> Page[LLMCard]:
+        """按 LLM.model 游标分页"""
+        llms = await self._keyset_page(session, select(LLM), LLM.model, after, limit)
+        return Page[LLMCard](
+            items=[LLMCard.model_validate(llm) for llm in llms],
+            next_cursor=llms[-1].model if len(llms) == limit else None,
+        )
+
+    async def interviewer_page(self, session: AsyncSession, after: str | None, limit: int) -> Page[InterviewerModel]:
+        """按 Interviewer.name 游标分页"""
+        interviewers = await self._keyset_page(session, select(Interviewer), Interviewer.name, after, limit)
+        return Page[InterviewerModel](
+            items=[InterviewerModel.model_validate(interviewer) for interviewer in interviewers],
+            next_cursor=interviewers[-1].name if len(interviewers) == limit else None,
+        )
+
+    async def stream_job(self, session: AsyncSession) -> AsyncIterator[JobModel]:
+        """按 Job.name 顺序逐个迭代 Job"""
+        async for job in self._stream(session, select(Job).order_by(Job.name), Job.__tablename__):
+            yield JobModel.model_validate(job)
+
+    async def stream_cv_title(self, session: AsyncSession) -> AsyncIterator[str]:
+        """按顺序逐个迭代 cv 的名称"""
+        async for title in self._stream(session, select(CV.title).order_by(CV.title), CV.__tablename__):
+            yield title
+
+    async def stream_llm(self, session: AsyncSession) -> AsyncIterator[LLMCard]:
+        """按 LLM.model 顺序逐个迭代 LLM"""
+        async for llm in self._stream(session, select(LLM).order_by(LLM.model), LLM.__tablename__):
+            yield LLMCard.model_validate(llm)
+
+    async def stream_interviewer(self, session: AsyncSession) -> AsyncIterator[InterviewerModel]:
+        """按 Interviewer.name 顺序逐个迭代 Interviewer"""
+        dql_stmt = select(Interviewer).order_by(Interviewer.name)
+        async for interviewer in self._stream(session, dql_stmt, Interviewer.__tablename__):
+            yield InterviewerModel.model_validate(interviewer)
+
 
 class UpdateOperator:
     """
-    更新部分表的记录。
+    更新部分表的记录。每个更新为一条 `UPDATE ... RETURNING`，未匹配到记录时抛出 UpdateEmpty，
+    返回的新记录在事务提交后写穿到对应的 ALL_* 缓存
     
     APIs
     ```
@@ -354,54 +686,133 @@ class UpdateOperator:
     [admin] 更新大模型计费
     llm_cost_refresh(model: str, cost_limit: float) -> None
 
+    批量累加大模型费用，返回累加后的 LLMCard，不存在的模型被忽略
+    llm_cost_add(deltas: dict[str, float]) -> list[LLMCard]
+
     [admin] 更新 Interviewer 中的模型
     change_interviewer_llm(name: str, new_model_name: str) -> None
     ```
+
+    后台任务的状态更新不抛出 UpdateEmpty：
+    ```
+    领取一个可执行的任务并置为 running, 已被其它进程领取或已结束时返回 None
+    claim_task(task_id: int, lease: float) -> TaskModel | None
+
+    更新任务的一个步骤状态，同时刷新心跳
+    task_step(task_id: int, step: str, status: TaskStatus) -> None
+
+    更新任务状态
+    task_status(task_ids: list[int], status: TaskStatus, error: str | None) -> None
+
+    刷新执行中任务的心跳
+    task_heartbeat(task_ids: list[int]) -> None
+    ```
     """
 
     async def job(self, session: AsyncSession, model: JobModel):
         """更新一个 job"""
         where_clause = (Job.name == model.name)
-        await check_empty(session, Job, where_clause)
-        
         value = model.model_dump()
-        dml_stmt = update(Job).where(where_clause).values(**value)
-        await update_execute(
+        dml_stmt = update(Job).where(where_clause).values(**value).returning(Job)
+        job, = await update_returning(
             session=session,
             dml_stmt=dml_stmt,
             table=Job.__tablename__
         )
+        stage_item_replace(session, KeyFactory.get(KeyType.ALL_JOB), "name", JobModel.model_validate(job))
 
     async def llm_cost_refresh(self, session: AsyncSession, model: str, cost_limit: float):
         """更新大模型计费"""
         where_clause = (LLM.model == model)
-        empty_check_query = select(LLM).where(where_clause)
-        results = await session.scalars(empty_check_query)
-        if len(results.all()) == 0:
-            raise UpdateEmpty(table=Job.__tablename__, filter_condition=str(where_clause))
-        
         value = {"cost": 0., "cost_limit": cost_limit}
-        dml_stmt = update(LLM).where(where_clause).values(**value)
-        await update_execute(
+        dml_stmt = update(LLM).where(where_clause).values(**value).returning(LLM)
+        llm, = await update_returning(
             session=session,
             dml_stmt=dml_stmt,
             table=LLM.__tablename__
         )
+        stage_item_replace(session, KeyFactory.get(KeyType.ALL_LLM), "model", LLMCard.model_validate(llm))
+
+    async def llm_cost_add(self, session: AsyncSession, deltas: dict[str, float]) -> list[LLMCard]:
+        """
+        批量累加大模型费用。一条 `UPDATE ... FROM unnest(models, deltas)` 对每个模型执行 `cost = cost + delta`，
+        原子累加，多个 worker 并发写入互不覆盖。
+        只修改 cost 列，不失效级联的 interviewer 缓存；ALL_LLM 按更新后的行写穿 (含其它 worker)
+        """
+        increments = func.unnest(
+            cast(list(deltas.keys()), ARRAY(LLM.model.type)),
+            cast(list(deltas.values()), ARRAY(LLM.cost.type)),
+        ).table_valued("model", "delta").render_derived(name="increment")
+        dml_stmt = (
+            update(LLM)
+            .where(LLM.model == increments.c.model)
+            .values(cost=LLM.cost + increments.c.delta)
+            .returning(LLM)
+        )
+        result = await update_execute(session=session, dml_stmt=dml_stmt, table=LLM.__tablename__, cascade=False)
+        llm_cards = [LLMCard.model_validate(llm) for llm in result.scalars().all()]
+        for llm_card in llm_cards:
+            stage_item_replace(session, KeyFactory.get(KeyType.ALL_LLM), "model", llm_card)
+        return llm_cards
 
     async def change_interviewer_llm(self, session: AsyncSession, name: str, new_model_name: str):
         """更新 Interviewer 中的模型名称"""
         where_clause = (Interviewer.name == name)
-        empty_check_query = select(Interviewer).where(where_clause)
-        results = await session.scalars(empty_check_query)
-        if len(results.all()) == 0:
-            raise UpdateEmpty(table=Job.__tablename__, filter_condition=str(where_clause))
-
-        dml_stmt = update(Interviewer).where(where_clause).values(model=new_model_name)
-        await update_execute(
+        dml_stmt = update(Interviewer).where(where_clause).values(model=new_model_name).returning(Interviewer)
+        interviewer, = await update_returning(
             session=session,
             dml_stmt=dml_stmt,
             table=Interviewer.__tablename__,
         )
+        stage_item_replace(
+            session, KeyFactory.get(KeyType.ALL_INTERVIEWER), "name", InterviewerModel.model_validate(interviewer)
+        )
+
+    async def claim_task(self, session: AsyncSession, task_id: int, lease: float) -> TaskModel | None:
+        """领取后台任务"""
+        dml_stmt = (
+            update(BackgroundTask)
+            .where((BackgroundTask.id_ == task_id) & _claimable(lease))
+            .values(status=TaskStatus.RUNNING.value, heartbeat=func.now())
+            .returning(BackgroundTask)
+        )
+        result = await update_execute(session=session, dml_stmt=dml_stmt, table=BackgroundTask.__tablename__)
+        task = result.scalar_one_or_none()
+        return TaskModel.model_validate(task) if task is not None else None
+
+    async def task_step(self, session: AsyncSession, task_id: int, step: str, status: TaskStatus) -> None:
+        """更新任务的一个步骤状态。以 jsonb 合并写入，并发完成的步骤互不覆盖"""
+        progress = BackgroundTask.progress.op("||")(func.jsonb_build_object(step, status.value))
+        dml_stmt = (
+            update(BackgroundTask)
+            .where(BackgroundTask.id_ == task_id)
+            .values(progress=progress, heartbeat=func.now())
+        )
+        await update_execute(session=session, dml_stmt=dml_stmt, table=BackgroundTask.__tablename__)
+
+    async def task_status(
+            self,
+            session: AsyncSession,
+            task_ids: list[int],
+            status: TaskStatus,
+            error: str | None = None,
+    ) -> None:
+        """更新任务状态"""
+        dml_stmt = (
+            update(BackgroundTask)
+            .where(BackgroundTask.id_.in_(task_ids))
+            .values(status=status.value, error=error, heartbeat=func.now())
+        )
+        await update_execute(session=session, dml_stmt=dml_stmt, table=BackgroundTask.__tablename__)
+
+    async def task_heartbeat(self, session: AsyncSession, task_ids: list[int]) -> None:
+        """刷新执行中任务的心跳"""
+        dml_stmt = (
+            update(BackgroundTask)
+            .where(BackgroundTask.id_.in_(task_ids) & (BackgroundTask.status == TaskStatus.RUNNING.value))
+            .values(heartbeat=func.now())
+        )
+        await update_execute(session=session, dml_stmt=dml_stmt, table=BackgroundTask.__tablename__)
 
 
 class DeleteOperator:
@@ -440,39 +851,26 @@ class DeleteOperator:
         dml_stmt = delete(Domain).where(where_clause)
 
         await delete_execute(session=session, dml_stmt=dml_stmt, table=Domain.__tablename__)
-        global_cache.pop(
-            KeyFactory.get(
-                KeyType.DOMAIN_SUBDOMAIN,
-                domain_name=domain_name,
-                sub_domain_name=sub_domain_name
-            )
-        )
-        global_cache.pop(KeyFactory.get(KeyType.ALL_DOMAIN_NAME))
     
     async def cv(self, session: AsyncSession, title: str):
         """删除一个 cv"""
         dml_stmt = delete(CV).where(CV.title == title)
         await delete_execute(session=session, dml_stmt=dml_stmt, table=CV.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.CV_TITLE, title=title))
-        global_cache.pop(KeyFactory.get(KeyType.ALL_CV_TITLE))
 
     async def job(self, session: AsyncSession, name: str):
         """删除一个 job"""
         dml_stmt = delete(Job).where(Job.name == name)
         await delete_execute(session=session, dml_stmt=dml_stmt, table=Job.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_JOB))
 
     async def llm(self, session: AsyncSession, model: str):
         """删除一个 llm"""
         dml_stmt = delete(LLM).where(LLM.model == model)
         await delete_execute(session=session, dml_stmt=dml_stmt, table=LLM.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_LLM))
     
     async def interviewer(self, session: AsyncSession, name: str):
         """删除一个 interviewer"""
         dml_stmt = delete(Interviewer).where(Interviewer.name == name)
         await delete_execute(session=session, dml_stmt=dml_stmt, table=Interviewer.__tablename__)
-        global_cache.pop(KeyFactory.get(KeyType.ALL_INTERVIEWER))
 
 
 insert_operator = InsertOperator()
@@ -1,11 +1,12 @@
 # data.orm
 from __future__ import annotations
 from sqlalchemy import (
-    Identity, VARCHAR, REAL, Text, ARRAY,
-    PrimaryKeyConstraint, UniqueConstraint, ForeignKeyConstraint,
+    Identity, Sequence, VARCHAR, CHAR, REAL, Text, ARRAY, TIMESTAMP,
+    PrimaryKeyConstraint, UniqueConstraint, ForeignKeyConstraint, Index, func,
 )
 from sqlalchemy.orm import DeclarativeBase, mapped_column, relationship, Mapped
 from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
 from typing import Any
 
 
@@ -17,6 +18,10 @@ class Base2(DeclarativeBase):
     pass
 
 
+# domain_id 分配器。随 Base.metadata 创建与删除, nextval 不阻塞并发事务
+DOMAIN_ID_SEQ = Sequence("domain_id_seq", start=1, metadata=Base.metadata)
+
+
 class Variable(Base2):
     """服务端变量表"""
     name: Mapped[str] = mapped_column(VARCHAR(20), primary_key=True)
@@ -26,7 +31,7 @@ class Variable(Base2):
 
 
 class Domain(Base):
-    """领域表"""
+    """领域表。同一领域的所有子领域共用一个 `domain_id`，由 `DOMAIN_ID_SEQ` 分配"""
     domain_name: Mapped[str] = mapped_column(VARCHAR(20), nullable=False)
     sub_domain_name: Mapped[str] = mapped_column(VARCHAR(20), nullable=False)
     domain_id: Mapped[int] = mapped_column(nullable=False)
@@ -40,7 +45,11 @@ class Domain(Base):
 
 
 class Question(Base):
-    """问题表。外键关联 `domain` 表。级联更新与删除。"""
+    """
+    问题表。外键关联 `domain` 表。级联更新与删除。
+    `content_hash` 为规范化题干的 sha256，同一子领域内唯一，用于丢弃重复生成的题目。
+    该唯一约束以外键列为前缀，同时充当 join 与级联删除使用的外键索引
+    """
     id_: Mapped[int] = mapped_column(Identity(start=1), name="id", primary_key=True)
     domain_id: Mapped[int] = mapped_column(nullable=False)
     sub_domain_id: Mapped[int] = mapped_column(nullable=False)
@@ -49,9 +58,11 @@ class Question(Base):
     criterion_low: Mapped[str] = mapped_column(Text(), nullable=False)
     criterion_mid: Mapped[str] = mapped_column(Text(), nullable=False)
     criterion_high: Mapped[str] = mapped_column(Text(), nullable=False)
+    content_hash: Mapped[str] = mapped_column(CHAR(64), nullable=False)
 
     __tablename__ = "question"
     __table_args__ = (
+        UniqueConstraint("domain_id", "sub_domain_id", "content_hash"),
         ForeignKeyConstraint(
             columns=["domain_id", "sub_domain_id"],
             refcolumns=["domain.domain_id", "domain.sub_domain_id"],
@@ -68,6 +79,9 @@ class CV(Base):
     project_experience: Mapped[list[str]] = mapped_column(ARRAY(Text), nullable=False)
 
     __tablename__ = "cv"
+    __table_args__ = (
+        Index("ix_cv_skills", "skills", postgresql_using="gin"),
+    )
 
 
 class Job(Base):
@@ -77,6 +91,9 @@ class Job(Base):
     job_responsibilities: Mapped[list[str]] = mapped_column(ARRAY(Text), nullable=False)
 
     __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_job_requirements", "job_requirements", postgresql_using="gin"),
+    )
 
 
 
@@ -110,6 +127,26 @@ class Interviewer(Base):
             ondelete="SET NULL",
             onupdate="CASCADE",
         ),
+        Index("ix_interviewer_model", "model"),
     )
 
 
+class BackgroundTask(Base):
+    """
+    后台任务表 (表名 `task`，`job` 已用于岗位)。
+    `progress` 为 {步骤名: 状态}，步骤状态与该步骤写入的数据在同一事务内更新，恢复执行时跳过已完成的步骤。
+    执行中的进程定期刷新 `heartbeat`，超过租约未刷新的 running 任务视为执行进程已退出，可被重新领取
+    """
+    id_: Mapped[int] = mapped_column(Identity(start=1), name="id", primary_key=True)
+    kind: Mapped[str] = mapped_column(VARCHAR(30), nullable=False)
+    status: Mapped[str] = mapped_column(VARCHAR(10), nullable=False)
+    params: Mapped[dict[str, Any]] = mapped_column(JSONB(), nullable=False)
+    progress: Mapped[dict[str, str]] = mapped_column(JSONB(), nullable=False)
+    error: Mapped[str | None] = mapped_column(Text(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    heartbeat: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __tablename__ = "task"
+    __table_args__ = (
+        Index("ix_task_status", "status"),
+    )
@@ -0,0 +1,80 @@
+# data.pool
+# 连接池配置与运行指标
+from ..metrics import Histogram
+import time
+from typing import Any
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class PoolMetrics:
+    """
+    单个连接池的运行指标
+
+    Attributes:
+        waiting (int): 正在等待获取连接的请求数
+        timeouts (int): 等待超过 pool_timeout 的次数
+        wait_time (Histogram): 获取连接耗时, 含排队、新建连接与 pre_ping
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self.timeouts = 0
+        self.wait_time = Histogram()
+
+
+def instrumented_pool(metrics: PoolMetrics) -> type[AsyncAdaptedQueuePool]:
+    """
+    生成记录 `metrics` 的连接池类。指标挂在类上，engine.dispose 重建连接池 (`recreate`) 后仍然累计
+    """
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        def connect(self) -> PoolProxiedConnection:
+            metrics.waiting += 1
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            finally:
+                metrics.waiting -= 1
+                metrics.wait_time.observe(time.perf_counter() - start)
+
+    return InstrumentedPool
+
+
+def engine_options(config: dict[str, Any], metrics: PoolMetrics) -> dict[str, Any]:
+    """
+    将 data.pool 配置转换为 `create_async_engine` 的参数
+
+    - statement_cache_size: asyncpg 预编译语句缓存条数，经 pgbouncer transaction 模式连接时需设为 0
+    - statement_timeout: 每个连接的 statement_timeout, 单位 ms, 0 为不限制
+    """
+    return {
+        "poolclass": instrumented_pool(metrics),
+        "pool_size": config["pool_size"],
+        "max_overflow": config["max_overflow"],
+        "pool_timeout": config["pool_timeout"],
+        "pool_recycle": config["pool_recycle"],
+        "pool_pre_ping": config["pre_ping"],
+        "connect_args": {
+            "prepared_statement_cache_size": config["statement_cache_size"],
+            "server_settings": {"statement_timeout": str(config["statement_timeout"])},
+        },
+    }
+
+
+def pool_snapshot(engine: AsyncEngine, metrics: PoolMetrics) -> dict[str, Any]:
+    """连接池当前状态与累计指标"""
+    pool = engine.sync_engine.pool
+    assert isinstance(pool, AsyncAdaptedQueuePool)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "waiting": metrics.waiting,
+        "timeouts": metrics.timeouts,
+        "wait_time": metrics.wait_time.snapshot(),
+    }
@@ -0,0 +1,112 @@
+# data.replica
+# 只读副本路由：只读 session 轮询分配到健康的副本，副本全部不可用时回退到主库。
+# 副本存在复制延迟，刚写入的数据可能尚未可见:
+# - 写请求之后 `max_lag` 秒内，同一客户端的读请求固定走主库 (read-your-writes, 见 DataBaseManager)
+# - 副本 session 带有 `REPLICA_SESSION` 标记，表被写入后 `max_lag` 秒内从副本读取的结果不写入缓存
+from .cache import REPLICA_SESSION
+from .pool import PoolMetrics, engine_options, pool_snapshot
+import asyncio
+import logging
+from itertools import count
+from typing import Any
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+logger = logging.getLogger(__name__)
+
+HEALTH_TIMEOUT = 2.  # 单次健康检查的超时时间, 单位 sec
+
+
+class ReplicaRouter:
+    """
+    只读副本连接池
+
+    - `pick` 按轮询顺序返回一个健康副本的序号，没有健康副本时返回 None
+    - 后台任务每 `health_interval` 秒对所有副本执行 `SELECT 1`，失败的副本在下一次检查成功前不参与轮询；
+      请求中获取副本连接失败时也可通过 `mark_down` 立即摘除
+
+    Attributes:
+        urls (list[str]): 副本连接 url
+        engines (list[AsyncEngine]): 每个副本一个 engine (连接池)
+        session_makers (list[async_sessionmaker]): 每个副本的 session 工厂，session.info 带有副本标记
+        healthy (list[bool]): 副本健康状态
+        metrics (list[PoolMetrics]): 每个副本连接池的运行指标
+    """
+
+    def __init__(self, urls: list[str], health_interval: float, pool_config: dict[str, Any]):
+        self.urls = urls
+        self.health_interval = health_interval
+        self.metrics = [PoolMetrics() for _ in urls]
+        self.engines: list[AsyncEngine] = [
+            create_async_engine(url=url, **engine_options(pool_config, metrics))
+            for url, metrics in zip(urls, self.metrics)
+        ]
+        self.session_makers: list[async_sessionmaker[AsyncSession]] = [
+            async_sessionmaker(
+                bind=engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                info={REPLICA_SESSION: True},
+            )
+            for engine in self.engines
+        ]
+        self.healthy = [True] * len(urls)
+        self.__counter = count()
+        self.__task: asyncio.Task | None = None
+
+    def pick(self) -> int | None:
+        """轮询选择一个健康副本"""
+        start = next(self.__counter)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self.healthy[index]:
+                return index
+        return None
+
+    def pool_stats(self) -> list[dict[str, Any]]:
+        """每个副本的健康状态与连接池指标"""
+        return [
+            {"replica": index, "healthy": self.healthy[index], **pool_snapshot(engine, self.metrics[index])}
+            for index, engine in enumerate(self.engines)
+        ]
+
+    def mark_down(self, index: int) -> None:
+        if self.healthy[index]:
+            logger.warning(f"replica {index} marked unhealthy")
+        self.healthy[index] = False
+
+    async def __ping(self, index: int) -> None:
+        async with self.engines[index].connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def __check_one(self, index: int) -> None:
+        try:
+            await asyncio.wait_for(self.__ping(index), timeout=HEALTH_TIMEOUT)
+        except Exception:
+            self.mark_down(index)
+            return
+        if not self.healthy[index]:
+            logger.info(f"replica {index} recovered")
+        self.healthy[index] = True
+
+    async def check(self) -> None:
+        """检查全部副本"""
+        await asyncio.gather(*(self.__check_one(index) for index in range(len(self.engines))))
+
+    async def __run(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    async def start(self) -> None:
+        """检查一次副本状态，并启动后台健康检查"""
+        await self.check()
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        """停止健康检查，关闭副本连接池"""
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        for engine in self.engines:
+            await engine.dispose()
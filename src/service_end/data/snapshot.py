@@ -0,0 +1,128 @@
+# data.snapshot
+# 缓存快照：关闭服务时将缓存写入磁盘，启动时加载，避免重启后所有热点缓存同时回源
+#
+# 文件格式 (大端序)
+# ```
+# | 字段 | 格式 |
+# | --- | --- |
+# | magic | 8 bytes, b"SIMUCACH" |
+# | version | uint8 |
+# | schema fingerprint | 32 bytes, ORM 表结构 + Pydantic 模型字段的 sha256 |
+# | written_at | float64, 写入时间戳 |
+# | entries | 重复至文件结尾: created (float64), expires (float64), length (uint32), pickle 数据 |
+# ```
+# pickle 数据为 (key, value, tables, key_type_value)。快照文件只由本服务写入，不可加载来源不明的文件
+from .cache import DBCache, KeyType, NegativeResult
+from .orm import Base, Base2
+from . import model
+import os
+import time
+import struct
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SIMUCACH"
+VERSION = 1
+HEADER = struct.Struct(">8sB32sd")
+ENTRY_HEADER = struct.Struct(">ddI")
+
+# 会被缓存的 Pydantic 模型，字段变化时旧快照不可用
+_CACHED_MODELS = (
+    model.QuestionModel, model.DomainQuestionBank, model.JobModel,
+    model.CVModel, model.CVBasicInfo, model.WorkExperience,
+    model.LLMCard, model.InterviewerModel,
+)
+
+
+def schema_fingerprint() -> bytes:
+    """ORM 表结构与缓存数据模型字段的指纹"""
+    h = hashlib.sha256()
+    for metadata in (Base.metadata, Base2.metadata):
+        for table in metadata.sorted_tables:
+            h.update(f"table {table.name}\n".encode())
+            for column in table.columns:
+                h.update(f"{column.name} {column.type!r} {column.nullable} {column.primary_key}\n".encode())
+    for cls in _CACHED_MODELS:
+        h.update(f"model {cls.__name__} {sorted(cls.model_fields)}\n".encode())
+    return h.digest()
+
+
+def save_snapshot(cache: DBCache, path: str | Path) -> int:
+    """将未过期的缓存写入 `path`，返回写入条数。先写临时文件再替换，多 worker 同时写入时不会留下损坏文件"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    now = time.time()
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, schema_fingerprint(), now))
+        for key, entry in list(cache.cache.items()):
+            if entry.expires <= now or isinstance(entry.value, NegativeResult):
+                continue
+            key_type = entry.key_type.value if entry.key_type is not None else None
+            try:
+                data = pickle.dumps((key, entry.value, entry.tables, key_type), protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                logger.warning(f"cache entry not picklable, skipped: {key}")
+                continue
+            f.write(ENTRY_HEADER.pack(entry.created, entry.expires, len(data)))
+            f.write(data)
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def load_snapshot(cache: DBCache, path: str | Path, max_age: float) -> int:
+    """
+    从 `path` 加载缓存，返回加载条数。以下情况丢弃快照：
+    - 文件格式或版本不符
+    - 表结构/模型指纹不一致
+    - 快照写入时间早于 `max_age` 秒前 (期间其它 worker 的写入无法感知)
+
+    停机期间其它 worker 的写入通知已丢失，加载的缓存可能是旧数据，每条缓存的剩余存活时间不超过 `max_age`
+    """
+    path = Path(path)
+    if not path.exists():
+        return 0
+    now = time.time()
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            logger.warning(f"cache snapshot truncated, discarded: {path}")
+            return 0
+        magic, version, fingerprint, written_at = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            logger.warning(f"cache snapshot format mismatch, discarded: {path}")
+            return 0
+        if fingerprint != schema_fingerprint():
+            logger.warning(f"cache snapshot schema mismatch, discarded: {path}")
+            return 0
+        if now - written_at > max_age:
+            logger.info(f"cache snapshot older than {max_age}s, discarded: {path}")
+            return 0
+
+        count = 0
+        while entry_header := f.read(ENTRY_HEADER.size):
+            if len(entry_header) < ENTRY_HEADER.size:
+                break
+            created, expires, length = ENTRY_HEADER.unpack(entry_header)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            if expires <= now:
+                continue
+            key, value, tables, key_type = pickle.loads(data)
+            cache.update(
+                key=key,
+                value=value,
+                tables=tables,
+                key_type=KeyType(key_type) if key_type is not None else None,
+                ttl=min(expires, now + max_age) - created,
+                created=created,
+            )
+            count += 1
+    return count
@@ -3,19 +3,106 @@ from ..exception import (
     QueryError, InsertError, UpdateError, DeleteError,
     IntegrityDataError, UpdateEmpty, TargetedRecordNotFound
 )
+from .orm import Base
+from .model import UpsertResult
+from .cache import DIRTY_TABLES, replace_items
 from enum import Enum
-from typing import TypeVar
-from sqlalchemy import exc, Select, Insert, Update, Delete, select
+from functools import lru_cache, partial
+from pydantic import BaseModel
+from typing import TypeVar, Sequence, Any, Callable
+import re
+import hashlib
+import asyncpg
+from sqlalchemy import exc, Select, Insert, Update, Delete, Result, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 T = TypeVar("T")
+CACHE_PATCHES = "cache_patches"  # session.info 中记录本事务缓存写穿更新的键
+CACHE_REPLACES = "cache_replaces"  # session.info 中记录本事务列表缓存元素替换 (随失效通知广播) 的键
 
 
 class VariableEnum(Enum):
     """常量名称枚举类"""
-    DOMAIN_COUNT = "DOMAIN_COUNT"
+    DOMAIN_COUNT = "DOMAIN_COUNT"  # 已由 domain_id_seq 取代，仅在启动时用于同步序列
+    SCHEMA_VERSION = "SCHEMA_VERSION"  # 已应用的 schema 迁移版本，见 migration.py
 
-VariableInitialDict = {"DOMAIN_COUNT": 0} # 常量初始值
+VariableInitialDict = {"DOMAIN_COUNT": 0, "SCHEMA_VERSION": 0} # 常量初始值
+
+
+class TaskStatus(Enum):
+    """后台任务及其步骤的状态"""
+    PENDING = "pending"      # 等待执行
+    RUNNING = "running"      # 执行中
+    SUCCEEDED = "succeeded"  # 完成
+    FAILED = "failed"        # 失败, 不再自动重试
+
+
+class OnConflict(Enum):
+    """批量写入遇到唯一约束冲突时的处理方式"""
+    ERROR = "error"    # 抛出 IntegrityDataError，整批失败
+    SKIP = "skip"      # 跳过冲突行
+    UPDATE = "update"  # 用新数据更新冲突行
+
+
+def question_content_hash(question: str) -> str:
+    """题干的内容哈希。合并空白、忽略大小写后计算 sha256"""
+    normalized = re.sub(r"\s+", " ", question).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def cascade_tables(table: str) -> frozenset[str]:
+    """`table` 及通过外键级联 (ON DELETE / ON UPDATE) 会被连带修改的表"""
+    tables = {table}
+    for child in Base.metadata.tables.values():
+        for fk in child.foreign_keys:
+            if fk.column.table.name == table and (fk.ondelete or fk.onupdate) and child.name not in tables:
+                tables |= cascade_tables(child.name)
+    return frozenset(tables)
+
+
+def mark_dirty(session: AsyncSession, table: str, cascade: bool = True) -> None:
+    """
+    登记本事务写入的表。事务提交后由 `DataBaseManager` 使依赖这些表的缓存失效。
+    `cascade` 为 False 时不登记级联表，用于不修改外键引用列的更新
+    """
+    session.info.setdefault(DIRTY_TABLES, set()).update(cascade_tables(table) if cascade else (table,))
+
+
+def pop_dirty_tables(session: AsyncSession) -> set[str]:
+    """取出并清空本事务写入的表"""
+    return session.info.pop(DIRTY_TABLES, set())
+
+
+def stage_cache_patch(session: AsyncSession, key: str, patch: Callable[[Any], Any]) -> None:
+    """
+    登记事务提交后对缓存 `key` 的写穿更新：`patch` 接收旧缓存值、返回新值，缓存不存在时不调用。
+    同一事务内多次登记同一 key 时按登记顺序依次应用
+    """
+    patches = session.info.setdefault(CACHE_PATCHES, {})
+    previous = patches.get(key)
+    patches[key] = patch if previous is None else (lambda value: patch(previous(value)))
+
+
+def pop_cache_patches(session: AsyncSession) -> dict[str, Callable[[Any], Any]]:
+    """取出并清空本事务登记的缓存写穿更新"""
+    return session.info.pop(CACHE_PATCHES, {})
+
+
+def stage_item_replace(session: AsyncSession, key: str, attr: str, item: BaseModel) -> None:
+    """
+    登记事务提交后列表缓存 `key` 中 `attr` 相同元素的替换。
+    替换随失效通知广播，其它 worker 同样写穿更新而不是移除该缓存
+    """
+    replacement = (attr, item.model_dump(mode="json"))
+    stage_cache_patch(session, key, partial(replace_items, [replacement]))
+    session.info.setdefault(CACHE_REPLACES, {}).setdefault(key, []).append(replacement)
+
+
+def pop_cache_replaces(session: AsyncSession) -> dict[str, list[tuple[str, dict[str, Any]]]]:
+    """取出并清空本事务登记的列表缓存元素替换"""
+    return session.info.pop(CACHE_REPLACES, {})
 
 
 async def query_one_record(
@@ -52,21 +139,22 @@ async def insert_execute(
         session: AsyncSession,
         dml_stmt: Insert,
         table: str
-) -> None:
+) -> Result:
     """
     批量插入数据。插入后 commit
 
     Args:
         session: 异步 Session 对象
         dml_stmt: Insert statement
-        table: 表名，用于异常记录
+        table: 表名，用于异常记录与缓存失效
     
     Exceptions:
         InsertError: 插入期间发生一致性异常、数据异常
         DatabaseException: 其它来自 SQLAlchemy 的异常
     """
+    mark_dirty(session=session, table=table)
     try:
-        await session.execute(statement=dml_stmt)
+        return await session.execute(statement=dml_stmt)
     except (exc.IntegrityError, exc.DataError,) as e:
         raise IntegrityDataError(
             source_class=e.__class__.__name__,
@@ -77,33 +165,117 @@ async def insert_execute(
         raise InsertError(source_class=e.__class__.__name__, table=table) from e
 
 
-async def check_empty(session, Data, where_clause):
-    """在更新前检查 ORM 类 Data 在 where_clause 过滤下是否有查询结果，否则抛出 UpdateEmpty 异常"""
-    empty_check_query = select(Data).where(where_clause)
-    results = await session.scalars(empty_check_query)
-    if len(results.all()) == 0:
-        raise UpdateEmpty(table=Data.__tablename__, filter_condition=str(where_clause))
+async def upsert_execute(
+        session: AsyncSession,
+        Data: type[Base],
+        data: list[dict[str, Any]],
+        on_conflict: OnConflict,
+        index_elements: Sequence[str],
+        update_columns: Sequence[str] = (),
+) -> UpsertResult:
+    """
+    `INSERT ... ON CONFLICT` 批量写入 ORM 类 Data 对应的表，返回逐行结果统计
+
+    Args:
+        session: 异步 Session 对象
+        Data: ORM 类
+        data: 待写入记录
+        on_conflict: 冲突处理方式
+        index_elements: 判断冲突的唯一约束列
+        update_columns: `OnConflict.UPDATE` 时覆盖的列
+    """
+    table = Data.__tablename__
+    if on_conflict == OnConflict.ERROR:
+        await insert_execute(session=session, dml_stmt=pg_insert(Data).values(data), table=table)
+        return UpsertResult(inserted=len(data))
+
+    # 同一条语句不能两次更新同一行：按冲突键去重, SKIP 保留首条, UPDATE 保留末条
+    unique: dict[tuple, dict[str, Any]] = {}
+    for row in data:
+        key = tuple(row[c] for c in index_elements)
+        if on_conflict == OnConflict.UPDATE:
+            unique[key] = row
+        else:
+            unique.setdefault(key, row)
+
+    stmt = pg_insert(Data).values(list(unique.values()))
+    if on_conflict == OnConflict.SKIP:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    stmt = stmt.returning(literal_column("xmax = 0").label("inserted"))  # 新插入行的 xmax 为 0
+    result = await insert_execute(session=session, dml_stmt=stmt, table=table)
+    flags = result.scalars().all()
+    inserted = sum(flags)
+    return UpsertResult(
+        inserted=inserted,
+        updated=len(flags) - inserted,
+        skipped=len(data) - len(flags),
+    )
+
+
+async def copy_execute(
+        session: AsyncSession,
+        table: str,
+        columns: Sequence[str],
+        records: Sequence[tuple],
+        temporary: bool = False,
+) -> None:
+    """
+    通过 asyncpg 二进制 COPY 批量写入记录。在 session 当前事务内执行，随事务提交
+
+    Args:
+        session: 异步 Session 对象，须已在事务内执行过语句 (asyncpg 驱动延迟开启事务)
+        table: 表名，用于 COPY、异常记录与缓存失效
+        columns: 写入列名
+        records: 与 columns 对应的记录
+        temporary: 写入的是临时表，不登记缓存失效
+
+    Exceptions:
+        IntegrityDataError: 写入期间发生一致性异常、数据异常
+        InsertError: 其它异常
+    """
+    if not temporary:
+        mark_dirty(session=session, table=table)
+    try:
+        conn = await session.connection()
+        raw_conn = await conn.get_raw_connection()
+        await raw_conn.driver_connection.copy_records_to_table(table, records=records, columns=list(columns))
+    except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as e:
+        raise IntegrityDataError(
+            source_class=e.__class__.__name__,
+            table=table,
+            filter_condition="None",
+        ) from e
+    except (asyncpg.PostgresError, exc.SQLAlchemyError) as e:
+        raise InsertError(source_class=e.__class__.__name__, table=table) from e
 
 
 async def update_execute(
         session: AsyncSession,
         dml_stmt: Update,
         table: str,
-) -> None:
+        cascade: bool = True,
+) -> Result:
     """
     通过 execute 执行一条 update。更新后 commit
     
     Args:
         session: 异步 Session 对象
         dml_stmt: Update statement
-        table: 被更新表名称，用于异常记录
+        table: 被更新表名称，用于异常记录与缓存失效
+        cascade: 是否同时失效级联表的缓存，只更新非外键引用列时可设为 False
     
     Exceptions:
         InsertError: 更新期间发生一致性异常、数据异常
         DatabaseException: 其它来自 SQLAlchemy 的异常
     """
+    mark_dirty(session=session, table=table, cascade=cascade)
     try:
-        await session.execute(dml_stmt)
+        return await session.execute(dml_stmt)
     except (exc.IntegrityError, exc.DataError,) as e:
         raise IntegrityDataError(
             source_class=e.__class__.__name__,
@@ -118,6 +290,29 @@ async def update_execute(
         ) from e
 
 
+async def update_returning(
+        session: AsyncSession,
+        dml_stmt: Update,
+        table: str,
+) -> Sequence[Any]:
+    """
+    执行一条 `UPDATE ... RETURNING`，一次往返完成更新并取回被更新的行
+
+    Args:
+        session: 异步 Session 对象
+        dml_stmt: 带 returning 的 Update statement
+        table: 被更新表名称，用于异常记录与缓存失效
+
+    Exceptions:
+        UpdateEmpty: 未匹配到任何行
+    """
+    result = await update_execute(session=session, dml_stmt=dml_stmt, table=table)
+    rows = result.scalars().all()
+    if len(rows) == 0:
+        raise UpdateEmpty(table=table, filter_condition=str(dml_stmt.whereclause))
+    return rows
+
+
 async def delete_execute(
         session: AsyncSession,
         dml_stmt: Delete,
@@ -129,8 +324,9 @@ async def delete_execute(
     Args:
         session: 异步 Session 对象
         dml_stmt: Delete statement
-        table: 表名，用于异常记录
+        table: 表名，用于异常记录与缓存失效
     """
+    mark_dirty(session=session, table=table)
     try:
         await session.execute(dml_stmt)
     except exc.IntegrityError as e:
@@ -0,0 +1,121 @@
+# data.warmup
+# 启动时缓存预热：在 table_init 之后、开始接收请求之前预加载热点缓存。
+# 按优先级从低到高分阶段加载，优先级最高的 ALL_* 最后写入，LRU 淘汰时最后被淘汰
+from .cache import KeyType, KeyFactory
+from .operation import get_operator, global_cache
+from .orm import Domain, Question
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+__ALL_METHODS = (
+    get_operator.all_domain_name,
+    get_operator.all_job,
+    get_operator.all_cv_titles,
+    get_operator.all_llm,
+    get_operator.all_interviewer,
+)
+
+
+async def __warm_all(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    """ALL_* 缓存。每个查询使用独立 session 并发执行"""
+    async def run(method):
+        async with session_maker() as session:
+            await method(session=session)
+
+    await asyncio.gather(*(run(method) for method in __ALL_METHODS))
+
+
+async def __warm_domain_subdomain(session_maker: async_sessionmaker[AsyncSession], limit: int) -> None:
+    """一次查询加载题目数量最多的 `limit` 个 {domain_name}-{sub_domain_name} 的 id"""
+    if limit <= 0:
+        return
+    tables = (Domain.__tablename__,)
+    version = global_cache.table_version(tables)
+    async with session_maker() as session:
+        result = await session.execute(
+            select(Domain.domain_name, Domain.sub_domain_name, Domain.domain_id, Domain.sub_domain_id)
+            .outerjoin(Question)
+            .group_by(Domain.domain_name, Domain.sub_domain_name, Domain.domain_id, Domain.sub_domain_id)
+            .order_by(func.count(Question.id_).desc())
+            .limit(limit)
+        )
+        rows = result.all()
+    if global_cache.table_version(tables) != version:  # 加载期间被写入
+        return
+    global_cache.batch_update(
+        {
+            KeyFactory.get(
+                KeyType.DOMAIN_SUBDOMAIN,
+                domain_name=row.domain_name,
+                sub_domain_name=row.sub_domain_name,
+            ): (row.domain_id, row.sub_domain_id,)
+            for row in rows
+        },
+        tables=tables,
+        key_type=KeyType.DOMAIN_SUBDOMAIN,
+    )
+
+
+async def __warm_question_bank(session_maker: async_sessionmaker[AsyncSession], top_domains: int) -> None:
+    """题目数量最多的 `top_domains` 个领域的 QUESTION_BANK"""
+    if top_domains <= 0:
+        return
+    async with session_maker() as session:
+        dql_stmt = (
+            select(Domain.domain_name)
+            .join(Question)
+            .group_by(Domain.domain_name)
+            .order_by(func.count().desc())
+            .limit(top_domains)
+        )
+        domain_names = list((await session.scalars(dql_stmt)).all())
+
+    async def run(domain_name: str):
+        async with session_maker() as session:
+            await get_operator.domain_question_bank(session=session, domain_name=domain_name)
+
+    await asyncio.gather(*(run(name) for name in domain_names))
+
+
+async def cache_warmup(
+        session_maker: async_sessionmaker[AsyncSession],
+        top_domains: int,
+        timeout: float,
+) -> None:
+    """
+    预热缓存，超过 `timeout` (sec) 后放弃剩余部分。预热失败不影响服务启动。
+    各阶段内并发执行，按以下顺序加载，总条数不超过缓存剩余容量：
+
+    1. {domain_name}-{sub_domain_name} 的 id，按题目数量取剩余容量能容纳的部分
+    2. 题目数量最多的 `top_domains` 个领域的题库
+    3. 所有 ALL_* 缓存
+
+    服务未记录各领域的访问量，以题目数量近似代表使用频率
+    """
+    start = time.perf_counter()
+    capacity = global_cache.size - len(global_cache.cache)
+    top_domains = min(top_domains, max(capacity - len(__ALL_METHODS), 0))
+    subdomain_limit = capacity - len(__ALL_METHODS) - top_domains
+
+    async def stages():
+        await __warm_domain_subdomain(session_maker, subdomain_limit)
+        await __warm_question_bank(session_maker, top_domains)
+        await __warm_all(session_maker)
+
+    try:
+        await asyncio.wait_for(stages(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"cache warmup exceeded {timeout}s, remaining keys are loaded on demand")
+    except Exception:
+        logger.warning("cache warmup failed", exc_info=True)
+    else:
+        logger.info(
+            f"cache warmup finished in {time.perf_counter() - start:.3f}s, "
+            f"{len(global_cache.cache)} entries"
+        )
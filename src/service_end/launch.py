@@ -7,8 +7,9 @@ from .configs import APP_KWARGS, FASTAPI_KWARGS
 from .log import shutdown_log, setup_log
 setup_log()
 
-from .data import db, table_init
+from .data import db, table_init, warmup, invalidation_bus, load_cache_snapshot, save_cache_snapshot
 from .api import admin_router, user_router, global_handler
+from .service import task_queue, llm_gateway, cost_accumulator
 from .exception import ServiceEndExceptionBase
 import logging
 import uvicorn
@@ -25,8 +26,23 @@ api_logger = logging.getLogger("api")
 async def lifespan(app: FastAPI):
     # 数据库启动
     await table_init()
+    await db.start()
+    if invalidation_bus is not None:
+        assert db.engine
+        await invalidation_bus.start(db.engine)
+    # 加载缓存快照，预热快照中没有的缓存，完成前不接收请求
+    load_cache_snapshot()
+    await warmup()
+    await task_queue.start()
+    cost_accumulator.start()
     yield
+    await task_queue.stop()
+    await llm_gateway.close()
+    await cost_accumulator.stop()  # 在数据库关闭前写入剩余费用
+    save_cache_snapshot()
     # 数据库关闭
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
     await db.close()
     shutdown_log()
 
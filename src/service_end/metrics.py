@@ -0,0 +1,42 @@
+# 服务端运行指标
+
+import bisect
+
+# 默认延迟分桶上界, 单位 sec
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+
+class Histogram:
+    """
+    固定分桶直方图。`observe` O(log 桶数)
+
+    Attributes:
+        bounds (tuple[float, ...]): 分桶上界 (含)，最后一个桶为 +inf
+        counts (list[int]): 每个桶的观测次数
+        total (float): 观测值之和
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def snapshot(self) -> dict:
+        """导出为 JSON 友好的字典。buckets 的键为桶上界"""
+        count = self.count
+        buckets = {str(bound): n for bound, n in zip(self.bounds, self.counts)}
+        buckets["+inf"] = self.counts[-1]
+        return {
+            "count": count,
+            "sum": self.total,
+            "mean": self.total / count if count else 0.,
+            "buckets": buckets,
+        }
@@ -1,4 +1,12 @@
 from .question_gen import question_gen_workflow
 from .parse_cv import parse_cv_workflow
 
-__all__ = ["question_gen_workflow", "parse_cv_workflow"]
+from .tasks import task_queue, QUESTION_GEN_TASK, CV_PARSE_TASK
+from .llm_gateway import llm_gateway, LLMError, LLMCostLimitExceeded
+from .cost import cost_accumulator
+
+__all__ = [
+    "question_gen_workflow", "parse_cv_workflow",  # 工作流
+    "task_queue", "QUESTION_GEN_TASK", "CV_PARSE_TASK",  # 后台任务
+    "llm_gateway", "LLMError", "LLMCostLimitExceeded", "cost_accumulator",  # LLM 调用
+]
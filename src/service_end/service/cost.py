@@ -0,0 +1,88 @@
+# service.cost
+# LLM 费用的写回缓冲 (write-behind)：每次调用的费用先累加在内存中，定期批量写入 llm 表
+from ..data import db, update_operator
+from ..data.model import LLMCard
+from ..exception import ServiceInitException
+from collections import defaultdict
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CostAccumulator:
+    """
+    按模型累加 LLM 费用
+
+    - `add` 只累加到内存，不访问数据库
+    - 每 `flush_interval` 秒及 `stop` 时，用一条语句将各模型的增量以 `cost = cost + delta` 原子写入，
+      并记录返回的最新 cost (包含其它 worker 写入的增量)。写入失败时增量保留到下次
+    - `total` 用于 cost_limit 检查：最近一次写入返回的 cost (没有时使用 card.cost) 加上尚未写入的增量。
+      其它 worker 的费用最多滞后一个写入周期
+
+    Attributes:
+        flush_interval (float): 写入间隔, 单位 sec
+        pending (dict[str, float]): key: 模型, value: 尚未写入的费用
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self.pending: dict[str, float] = defaultdict(float)
+        self.__flushed: dict[str, float] = {}  # key: 模型, value: 最近一次写入返回的 cost
+        self.__lock = asyncio.Lock()
+        self.__task: asyncio.Task | None = None
+
+    def add(self, model: str, delta: float) -> None:
+        self.pending[model] += delta
+
+    def total(self, card: LLMCard) -> float:
+        """模型当前的累计费用"""
+        return self.__flushed.get(card.model, card.cost) + self.pending.get(card.model, 0.)
+
+    async def flush(self) -> None:
+        """写入全部增量"""
+        async with self.__lock:
+            deltas = {model: delta for model, delta in self.pending.items() if delta}
+            if not deltas:
+                # 近期无调用的模型改用调用方的 card.cost，使 llm_cost_refresh 等重置及时生效
+                self.__flushed.clear()
+                return
+            async with db.transaction() as session:
+                llm_cards = await update_operator.llm_cost_add(session=session, deltas=deltas)
+            for model, delta in deltas.items():  # 写入期间新增的费用留到下次
+                self.pending[model] -= delta
+                if not self.pending[model]:
+                    del self.pending[model]
+            self.__flushed = {llm_card.model: llm_card.cost for llm_card in llm_cards}
+            for model in deltas.keys() - self.__flushed.keys():
+                logger.warning(f"cost of unknown model dropped: {model}")
+                self.pending.pop(model, None)
+
+    async def __run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.warning("LLM cost flush failed, will retry", exc_info=True)
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        """停止定期写入，并写入剩余增量"""
+        if self.__task is not None:
+            async with self.__lock:  # 不在写入中途取消
+                self.__task.cancel()
+            self.__task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.error(f"LLM cost lost at shutdown: {dict(self.pending)}", exc_info=True)
+
+
+try:
+    from ..configs import SERVICE_CONFIG
+    cost_accumulator = CostAccumulator(flush_interval=SERVICE_CONFIG["llm_gateway"]["cost_flush_interval"])
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
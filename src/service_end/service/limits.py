@@ -0,0 +1,27 @@
+# service.limits
+# 按 LLM 的并发上限：同一模型的所有调用共享一个信号量，未单独配置的模型使用 default
+# 信号量只在 LLMGateway.chat 内获取，调用方不应再持有同一信号量 (不可重入，会互相等待)
+from ..exception import ServiceInitException
+import asyncio
+
+try:
+    from ..configs import SERVICE_CONFIG
+    LLM_CONCURRENCY: dict[str, int] = SERVICE_CONFIG["llm_concurrency"]
+    DEFAULT_CONCURRENCY = LLM_CONCURRENCY["default"]
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
+
+__semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def llm_concurrency(model: str) -> int:
+    """模型 `model` 的并发上限"""
+    return LLM_CONCURRENCY.get(model, DEFAULT_CONCURRENCY)
+
+
+def llm_semaphore(model: str) -> asyncio.Semaphore:
+    """模型 `model` 的并发信号量"""
+    semaphore = __semaphores.get(model)
+    if semaphore is None:
+        semaphore = __semaphores[model] = asyncio.Semaphore(llm_concurrency(model))
+    return semaphore
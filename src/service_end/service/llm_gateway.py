@@ -0,0 +1,253 @@
+# service.llm_gateway
+# LLM 网关：所有工作流通过这里调用 OpenAI 兼容的 chat completions 接口
+# - 每个 LLMCard (按 model) 一个长连接复用的 httpx.AsyncClient，`path` 为 base_url
+# - 每个模型一个并发信号量 (见 limits.py) 与一个令牌桶限速
+# - 连接异常、429、5xx 按带随机抖动的指数退避重试，429/503 优先使用 Retry-After
+# - 发送前检查 cost_limit，响应后按 usage 与配置的单价累加费用 (见 cost.py)，不在调用路径上访问数据库
+# - 相同请求命中响应缓存 (见 response_cache.py) 时不发送请求、不计费
+from ..data.model import LLMCard
+from ..exception import ServiceException, ServiceInitException
+from .limits import llm_semaphore
+from .cost import CostAccumulator, cost_accumulator
+from .response_cache import ResponseCache, response_key
+import os
+import time
+import random
+import asyncio
+import logging
+import httpx
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(ServiceException):
+    """LLM 调用失败"""
+    def __init__(self, model: str, message: str):
+        super().__init__()
+        self.model = model
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"LLM call failed: (model: {self.model}) {self.message}"
+
+
+class LLMCostLimitExceeded(LLMError):
+    """费用达到 cost_limit，不再发送请求"""
+    pass
+
+
+@dataclass(slots=True)
+class ChatResult:
+    """一次 chat completion 的结果"""
+    content: str              # 第一个 choice 的回复文本
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float               # 本次调用费用
+    raw: dict[str, Any]       # 原始响应
+    cached: bool = False      # 是否来自响应缓存
+
+
+class TokenBucket:
+    """
+    令牌桶：以 `rate` 个/sec 补充令牌，最多积累 `burst` 个。`acquire` 在令牌不足时等待
+    """
+
+    def __init__(self, rate: float, burst: float):
+        assert rate > 0 and burst >= 1
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.__lock:  # 排队等待的调用按到达顺序获得令牌
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMGateway:
+    """
+    LLM 网关
+
+    Attributes:
+        rate_limit (dict): key: 模型名称或 default, value: {rate, burst}
+        pricing (dict): key: 模型名称或 default, value: 每千 token 单价 {prompt, completion}
+        costs (CostAccumulator): 费用累加与 cost_limit 检查
+        responses (ResponseCache | None): 响应缓存, 未启用时为 None
+        transport (httpx.AsyncBaseTransport | None): 替换 HTTP 传输层，用于接入本地 stub
+    """
+
+    def __init__(
+            self,
+            config: dict[str, Any],
+            costs: CostAccumulator,
+            transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.timeout: float = config["timeout"]
+        self.max_connections: int = config["max_connections"]
+        self.max_keepalive: int = config["max_keepalive"]
+        self.max_retries: int = config["max_retries"]
+        self.backoff_base: float = config["backoff_base"]
+        self.backoff_max: float = config["backoff_max"]
+        self.api_key_env: str = config["api_key_env"]
+        self.rate_limit: dict[str, dict[str, float]] = config["rate_limit"]
+        self.pricing: dict[str, dict[str, float]] = config["pricing"]
+        assert "default" in self.rate_limit and "default" in self.pricing
+        self.costs = costs
+        cache_config = config["response_cache"]
+        self.responses = ResponseCache(
+            path=cache_config["path"], ttl=cache_config["ttl"], max_bytes=cache_config["max_bytes"],
+        ) if cache_config["enabled"] else None
+        self.transport = transport
+        self.__clients: dict[str, tuple[str, httpx.AsyncClient]] = {}  # key: model, value: (base_url, client)
+        self.__buckets: dict[str, TokenBucket] = {}
+        self.__retired: list[httpx.AsyncClient] = []  # base_url 变化后被替换的连接池
+
+    def client(self, card: LLMCard) -> httpx.AsyncClient:
+        """card 对应的连接池。card 的 base_url 变化时重建"""
+        if card.is_local:
+            raise LLMError(model=card.model, message="local model cards are not served over HTTP")
+        cached = self.__clients.get(card.model)
+        if cached is not None and cached[0] == card.path:
+            return cached[1]
+        if cached is not None:  # 旧连接池上可能仍有请求，在 close 时释放
+            self.__retired.append(cached[1])
+        api_key = os.environ.get(self.api_key_env)
+        client = httpx.AsyncClient(
+            base_url=card.path,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+            ),
+            transport=self.transport,
+        )
+        self.__clients[card.model] = (card.path, client)
+        return client
+
+    def bucket(self, model: str) -> TokenBucket:
+        bucket = self.__buckets.get(model)
+        if bucket is None:
+            limit = self.rate_limit.get(model, self.rate_limit["default"])
+            bucket = self.__buckets[model] = TokenBucket(rate=limit["rate"], burst=limit["burst"])
+        return bucket
+
+    def cost_of(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.pricing.get(model, self.pricing["default"])
+        return (prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1000
+
+    def check_cost(self, card: LLMCard, params: dict[str, Any]) -> None:
+        """发送前检查费用：已用费用加上按 max_tokens 估算的回复费用不得超过 cost_limit"""
+        cost = self.costs.total(card)
+        estimate = self.cost_of(card.model, 0, params.get("max_tokens", 0))
+        if cost + estimate > card.cost_limit:
+            raise LLMCostLimitExceeded(
+                model=card.model, message=f"cost {cost:.4f} + estimate {estimate:.4f} > limit {card.cost_limit}"
+            )
+
+    def __backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return min(float(response.headers["retry-after"]), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def __post(self, card: LLMCard, payload: dict[str, Any]) -> dict[str, Any]:
+        client = self.client(card)
+        max_retries = self.max_retries
+        for attempt in range(max_retries + 1):
+            response = None
+            try:
+                await self.bucket(card.model).acquire()
+                response = await client.post("/chat/completions", json=payload)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise LLMError(model=card.model, message=f"invalid JSON response: {response.text[:200]}") from e
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = f"{e.__class__.__name__}: {e}"
+            except httpx.HTTPStatusError as e:  # 4xx 不重试
+                raise LLMError(model=card.model, message=f"HTTP {e.response.status_code}: {e.response.text}") from e
+            if attempt == max_retries:
+                raise LLMError(model=card.model, message=f"{error}, gave up after {max_retries} retries")
+            delay = self.__backoff(attempt, response)
+            logger.info(f"LLM {card.model} {error}, retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def chat(
+            self, card: LLMCard, messages: list[dict[str, str]], cache: bool = True, **params: Any
+    ) -> ChatResult:
+        """
+        调用 chat completions。`params` 原样放入请求体 (如 temperature, max_tokens)。
+        费用累加到 `costs`，定期写入数据库，调用方持有的 card.cost 不会更新。
+        `cache` 为 False 时不读取响应缓存 (需要重新采样时使用)，成功的响应仍会写入缓存
+
+        Exceptions:
+            LLMCostLimitExceeded: 费用已达上限
+            LLMError: 本地模型、4xx 响应或重试耗尽
+        """
+        key = response_key(card.model, messages, params)
+        if cache and self.responses is not None:
+            data = await self.responses.get(key)
+            if data is not None:
+                return self.__result(card, data, cost=0., cached=True)
+
+        self.check_cost(card, params)
+        async with llm_semaphore(card.model):
+            data = await self.__post(card, {"model": card.model, "messages": messages, **params})
+
+        usage = data.get("usage") or {}
+        cost = self.cost_of(card.model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        if cost > 0:
+            self.costs.add(card.model, cost)
+        result = self.__result(card, data, cost=cost, cached=False)
+        if self.responses is not None:
+            await self.responses.put(key, card.model, data)
+        return result
+
+    @staticmethod
+    def __result(card: LLMCard, data: dict[str, Any], cost: float, cached: bool) -> ChatResult:
+        usage = data.get("usage") or {}
+        try:
+            content = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(model=card.model, message=f"malformed response: {data}") from e
+        return ChatResult(
+            content=content,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            cost=cost,
+            raw=data,
+            cached=cached,
+        )
+
+    async def close(self) -> None:
+        """关闭全部连接池与响应缓存"""
+        clients = [client for _, client in self.__clients.values()] + self.__retired
+        self.__clients.clear()
+        self.__retired = []
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+        if self.responses is not None:
+            self.responses.close()
+
+
+try:
+    from ..configs import SERVICE_CONFIG
+    llm_gateway = LLMGateway(config=SERVICE_CONFIG["llm_gateway"], costs=cost_accumulator)
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
@@ -1,4 +1,11 @@
 from ..data.model import CVModel, CVBasicInfo, WorkExperience
+from ..exception import ServiceInitException
+
+try:
+    from ..configs import SERVICE_CONFIG
+    CV_PARSE_MODEL = SERVICE_CONFIG["cv_parse"]["model"]
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
 
 
 async def parse_cv_workflow(cv_str: str, title: str) -> CVModel:
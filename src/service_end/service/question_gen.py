@@ -1,4 +1,11 @@
 from ..data.model import QuestionModel
+from ..exception import ServiceInitException
+
+try:
+    from ..configs import SERVICE_CONFIG
+    QUESTION_GEN_MODEL = SERVICE_CONFIG["question_gen"]["model"]
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
 
 
 async def question_gen_workflow(
@@ -0,0 +1,129 @@
+# service.response_cache
+# LLM 响应缓存：以 (model, messages, params) 的 sha256 为键，把响应持久化在本地 SQLite 文件中。
+# 工作流重试、任务恢复、重复上传同一份简历时，相同请求直接返回缓存的响应，不产生费用
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import logging
+import threading
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+EVICT_EVERY = 100  # 每写入多少条执行一次淘汰
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS response (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_response_accessed ON response (accessed);
+"""
+
+
+def response_key(model: str, messages: list[dict[str, str]], params: dict[str, Any]) -> str:
+    """请求的内容哈希。规范化 JSON (键排序、无多余空白) 后计算 sha256"""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM 响应缓存
+
+    - 数据库文件在第一次使用时创建，WAL 模式，多个 worker 进程可共用同一文件
+    - 读写在线程池中执行，不阻塞事件循环
+    - 超过 `ttl` 的响应读取时视为不存在；每写入 EVICT_EVERY 条删除过期条目，
+      总大小超过 `max_bytes` 时按最近访问时间淘汰
+
+    Attributes:
+        path (str): SQLite 文件路径
+        ttl (float): 响应存活时间, 单位 sec
+        max_bytes (int): 响应总字节上限
+    """
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.__conn: sqlite3.Connection | None = None
+        self.__lock = threading.Lock()  # sqlite3 连接不可被多个线程同时使用
+        self.__puts = 0
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self.__conn = conn
+        return self.__conn
+
+    def __get(self, key: str) -> dict[str, Any] | None:
+        with self.__lock:
+            conn = self.__connect()
+            now = time.time()
+            row = conn.execute("SELECT created, body FROM response WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created, body = row
+            if now - created >= self.ttl:
+                conn.execute("DELETE FROM response WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE response SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(body)
+
+    def __put(self, key: str, model: str, response: dict[str, Any]) -> None:
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        with self.__lock:
+            conn = self.__connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO response (key, model, created, accessed, size, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, now, now, len(body), body),
+            )
+            self.__puts += 1
+            if self.__puts % EVICT_EVERY == 0:
+                self.__evict(conn, now)
+
+    def __evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM response WHERE created <= ?", (now - self.ttl,))
+        # 按最近访问时间从新到旧累加大小，超出预算的部分删除
+        conn.execute(
+            "DELETE FROM response WHERE key IN ("
+            " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS running FROM response)"
+            " WHERE running > ?)",
+            (self.max_bytes,),
+        )
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """读取响应，不存在或已过期时返回 None。读取失败时记录日志并视为未命中"""
+        try:
+            return await asyncio.to_thread(self.__get, key)
+        except (sqlite3.Error, ValueError):
+            logger.warning(f"LLM response cache read failed: {key}", exc_info=True)
+            return None
+
+    async def put(self, key: str, model: str, response: dict[str, Any]) -> None:
+        """写入响应。写入失败时记录日志，不影响调用方"""
+        try:
+            await asyncio.to_thread(self.__put, key, model, response)
+        except sqlite3.Error:
+            logger.warning(f"LLM response cache write failed: {key}", exc_info=True)
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
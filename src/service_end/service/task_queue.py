@@ -0,0 +1,163 @@
+# service.task_queue
+# 进程内后台任务队列，任务记录持久化在 task 表
+from ..data import db, insert_operator, get_operator, update_operator
+from ..data.model import TaskModel
+from ..data.utils import TaskStatus
+from ..exception import ServiceException
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TaskModel], Awaitable[None]]
+StepRunner = Callable[[str], Awaitable[None]]
+
+
+class TaskError(ServiceException):
+    """后台任务执行失败"""
+    def __init__(self, message: str):
+        super().__init__()
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class TaskQueue:
+    """
+    后台任务队列
+
+    - `submit` 在独立事务内写入 pending 任务并提交，再放入本进程队列，返回任务记录
+    - `max_workers` 个 worker 从队列取出任务 id，先领取 (`claim_task`) 再执行对应 kind 的 handler，
+      同一任务不会被多个进程同时执行
+    - 执行期间每 `lease / 3` 秒刷新心跳，同时扫描待执行或心跳超过 `lease` 秒的任务 (执行进程已退出) 并放入队列
+    - `stop` 时本进程执行中的任务被取消并重置为 pending，下次启动后继续执行未完成的步骤
+
+    handler 只在写入时通过 `db.transaction()` 打开 session，不在 LLM 调用期间占用连接
+
+    Attributes:
+        max_workers (int): 同时执行的任务数
+        lease (float): 心跳租约, 单位 sec
+        handlers (dict[str, Handler]): key: 任务类型, value: handler
+    """
+
+    def __init__(self, max_workers: int, lease: float):
+        self.max_workers = max_workers
+        self.lease = lease
+        self.handlers: dict[str, Handler] = {}
+        self.__queue: asyncio.Queue[int] = asyncio.Queue()
+        self.__queued: set[int] = set()   # 已在本进程队列中的任务
+        self.__running: set[int] = set()  # 本进程执行中的任务
+        self.__tasks: list[asyncio.Task] = []
+
+    def register(self, kind: str) -> Callable[[Handler], Handler]:
+        """登记任务类型 `kind` 的 handler"""
+        def decorator(handler: Handler) -> Handler:
+            self.handlers[kind] = handler
+            return handler
+        return decorator
+
+    def __enqueue(self, task_id: int) -> None:
+        if task_id not in self.__queued and task_id not in self.__running:
+            self.__queued.add(task_id)
+            self.__queue.put_nowait(task_id)
+
+    async def submit(self, kind: str, params: dict[str, Any], steps: list[str]) -> TaskModel:
+        """提交任务"""
+        assert kind in self.handlers, f"unknown task kind: {kind}"
+        async with db.transaction() as session:
+            task = await insert_operator.task(session=session, kind=kind, params=params, steps=steps)
+        self.__enqueue(task.id)
+        return task
+
+    async def __scan(self) -> None:
+        assert db.session_maker
+        async with db.session_maker() as session:
+            task_ids = await get_operator.resumable_tasks(session=session, lease=self.lease)
+        for task_id in task_ids:
+            self.__enqueue(task_id)
+
+    async def __keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                if self.__running:
+                    async with db.transaction() as session:
+                        await update_operator.task_heartbeat(session=session, task_ids=list(self.__running))
+                await self.__scan()
+            except Exception:
+                logger.warning("task heartbeat failed", exc_info=True)
+
+    async def __execute(self, task_id: int) -> None:
+        async with db.transaction() as session:
+            task = await update_operator.claim_task(session=session, task_id=task_id, lease=self.lease)
+        if task is None:  # 已被其它进程领取或已结束
+            return
+        self.__running.add(task_id)
+        status, error = TaskStatus.SUCCEEDED, None
+        try:
+            handler = self.handlers.get(task.kind)
+            if handler is None:
+                raise TaskError(f"unknown task kind: {task.kind}")
+            await handler(task)
+        except asyncio.CancelledError:
+            raise  # 进程退出, 由 stop 重置为 pending
+        except Exception as e:
+            logger.warning(f"task {task_id} ({task.kind}) failed", exc_info=True)
+            status, error = TaskStatus.FAILED, str(e)
+        finally:
+            self.__running.discard(task_id)
+        async with db.transaction() as session:
+            await update_operator.task_status(session=session, task_ids=[task_id], status=status, error=error)
+
+    async def __work(self) -> None:
+        while True:
+            task_id = await self.__queue.get()
+            self.__queued.discard(task_id)
+            try:
+                await self.__execute(task_id)
+            except Exception:
+                logger.exception(f"task {task_id} could not be executed")
+
+    async def start(self) -> None:
+        """恢复未完成的任务，启动 worker"""
+        await self.__scan()
+        self.__tasks = [asyncio.create_task(self.__work()) for _ in range(self.max_workers)]
+        self.__tasks.append(asyncio.create_task(self.__keepalive()))
+
+    async def stop(self) -> None:
+        """取消 worker，执行中的任务重置为 pending"""
+        running = list(self.__running)
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.__tasks = []
+        if running:
+            async with db.transaction() as session:
+                await update_operator.task_status(session=session, task_ids=running, status=TaskStatus.PENDING)
+
+
+async def run_steps(task: TaskModel, run_step: StepRunner, concurrency: int) -> None:
+    """
+    并发执行任务中未完成的步骤，同时执行的步骤不超过 `concurrency` 个。`run_step` 须在写入数据的同一事务内将步骤标记为 succeeded
+    (或由调用方在 run_steps 返回后、写入全部结果的事务内标记)，
+    抛出异常的步骤标记为 failed，其余步骤继续执行；有步骤失败时抛出 TaskError
+    """
+    steps = [step for step, status in task.progress.items() if status != TaskStatus.SUCCEEDED.value]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(step: str) -> None:
+        try:
+            async with semaphore:
+                await run_step(step)
+        except Exception:
+            logger.warning(f"task {task.id} step {step} failed", exc_info=True)
+            async with db.transaction() as session:
+                await update_operator.task_step(session=session, task_id=task.id, step=step, status=TaskStatus.FAILED)
+            raise
+
+    results = await asyncio.gather(*(guarded(step) for step in steps), return_exceptions=True)
+    failed = [step for step, result in zip(steps, results) if isinstance(result, BaseException)]
+    if failed:
+        raise TaskError(f"{len(failed)}/{len(steps)} steps failed: {', '.join(failed)}")
@@ -0,0 +1,69 @@
+# service.tasks
+# 后台任务类型。每个子领域 / 每份简历为一个步骤，同时执行的步骤数不超过所用模型的 llm_concurrency。
+# 步骤使用任务内独立的信号量，不持有 llm_gateway 的模型信号量 (不可重入)。
+# 生成结果与步骤状态在同一事务内写入，恢复执行时不会重复写入。
+# 题目生成的全部子领域在一个事务内写入，简历逐份写入
+from ..data import db, insert_operator, update_operator
+from ..data.model import TaskModel, QuestionModel
+from ..data.utils import TaskStatus, OnConflict
+from ..exception import ServiceInitException
+from .limits import llm_concurrency
+from .question_gen import question_gen_workflow, QUESTION_GEN_MODEL
+from .parse_cv import parse_cv_workflow, CV_PARSE_MODEL
+from .task_queue import TaskQueue, run_steps
+
+try:
+    from ..configs import SERVICE_CONFIG
+    task_queue = TaskQueue(
+        max_workers=SERVICE_CONFIG["tasks"]["max_workers"],
+        lease=SERVICE_CONFIG["tasks"]["lease"],
+    )
+except KeyError as e:
+    raise ServiceInitException(source_class=None, message=f"config key missing: {e}")
+
+QUESTION_GEN_TASK = "question_gen"  # params: {domain_name, number}, 步骤: 子领域名称
+CV_PARSE_TASK = "cv_parse"          # params: {cvs: {title: 简历原文}}, 步骤: 简历名称
+
+
+@task_queue.register(QUESTION_GEN_TASK)
+async def question_gen_task(task: TaskModel) -> None:
+    """
+    为领域的各子领域生成并写入题目。各子领域并发生成，全部成功后在一个事务内写入并标记步骤完成，
+    领域的题目要么全部写入、要么都不写入；有子领域失败或进程退出时重新执行全部子领域
+    """
+    domain_name, number = task.params["domain_name"], task.params["number"]
+    generated: dict[str, list[QuestionModel]] = {}
+
+    async def run_step(sub_domain_name: str) -> None:
+        generated[sub_domain_name] = await question_gen_workflow(
+            domain_name=domain_name,
+            sub_domain_name=sub_domain_name,
+            number=number
+        )
+
+    await run_steps(task, run_step, concurrency=llm_concurrency(QUESTION_GEN_MODEL))
+    async with db.transaction() as session:
+        for sub_domain_name, questions in generated.items():
+            await insert_operator.question_batch(
+                session=session,
+                domain_name=domain_name,
+                sub_domain_name=sub_domain_name,
+                models=questions,
+            )
+            await update_operator.task_step(
+                session=session, task_id=task.id, step=sub_domain_name, status=TaskStatus.SUCCEEDED
+            )
+
+
+@task_queue.register(CV_PARSE_TASK)
+async def cv_parse_task(task: TaskModel) -> None:
+    """解析并写入一批简历，同名简历覆盖"""
+    cvs: dict[str, str] = task.params["cvs"]
+
+    async def run_step(title: str) -> None:
+        cv = await parse_cv_workflow(cv_str=cvs[title], title=title)
+        async with db.transaction() as session:
+            await insert_operator.cv_batch(session=session, models=[cv], on_conflict=OnConflict.UPDATE)
+            await update_operator.task_step(session=session, task_id=task.id, step=title, status=TaskStatus.SUCCEEDED)
+
+    await run_steps(task, run_step, concurrency=llm_concurrency(CV_PARSE_MODEL))